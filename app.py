@@ -1,8 +1,15 @@
 import os
+import shutil
 import tempfile
 import json
 import base64
-from flask import Flask, request, jsonify, send_file, render_template, session
+import hmac
+import io
+import logging
+import time
+import uuid
+from contextlib import nullcontext
+from flask import Flask, request, jsonify, send_file, render_template, session, g
 from werkzeug.utils import secure_filename
 from rdkit import Chem
 from rdkit.Chem import AllChem, Draw
@@ -13,6 +20,27 @@ from openfe.setup.ligand_network_planning import (
     generate_minimal_redundant_network,
     generate_radial_network
 )
+from utils.score_matrix import ScoreMatrixRecorder, sparse_score_matrices_to_bytes
+from utils.sparse_network import generate_sparse_network
+from utils.layout import force_directed_layout
+from utils.network_encoding import available_encodings, compress, encode_compact_network
+from utils.metrics import (
+    REGISTRY, REQUESTS, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, PAIRS_MAPPED,
+    record_cache_lookup, stage_timer
+)
+from utils.structured_logging import configure_logging
+from utils.profiling import PROFILE_MODES, ProfilerBusy, RunProfiler
+from utils.rbfe_jobs import RBFEJob, RBFEJobQueue
+from utils.tar_stream import stream_tar_gz
+from utils.plan_cache import LRUCache
+from utils.low_memory import LigandStore, MemoryGuard, MemoryLimitExceeded, SpilledPairs, plan_low_memory_network
+
+logger = logging.getLogger('feplanner')
+
+# WSGI servers and scripts import the app instead of running __main__, so apply
+# the logging environment variables at import time when they are set
+if os.environ.get('FEPLANNER_LOG_LEVEL') or os.environ.get('FEPLANNER_LOG_FORMAT'):
+    configure_logging()
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # For session management
@@ -22,16 +50,100 @@ UPLOAD_FOLDER = tempfile.mkdtemp()
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 megabytes
 
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
 # Configure allowed file extensions
 ALLOWED_EXTENSIONS = {'sdf'}
 
 # Global variable to store SDF data temporarily for the current session
 sdf_cache = {}
 
+# Profiles of individual planning requests, written to PROFILE_FOLDER and keyed by profile ID
+PROFILE_FOLDER = tempfile.mkdtemp()
+profile_cache = {}
+
+# Number of plans kept for the follow-up requests (depictions, mappings, score
+# matrix, RBFE jobs); a plan holds O(N^2) scored pairs, so the least recently
+# used one is evicted, with its SDF, profile and low-memory files
+MAX_PLANS = int(os.environ.get('FEPLANNER_MAX_PLANS', 32))
+
+def evict_plan(sdf_id, plan):
+    """Release everything kept for an evicted plan."""
+    sdf_cache.pop(sdf_id, None)
+    profile_path = profile_cache.pop(plan.get('profile_id'), None)
+    if profile_path is not None and os.path.exists(profile_path):
+        os.remove(profile_path)
+    if isinstance(plan.get('ligands'), LigandStore):
+        plan['ligands'].close()
+        shutil.rmtree(os.path.dirname(plan['ligands'].path), ignore_errors=True)
+    logger.debug("Evicted plan %s", sdf_id)
+
+# Per-plan artifacts (score matrices, ...) keyed by the same ID as sdf_cache
+plan_cache = LRUCache(MAX_PLANS, on_evict=evict_plan)
+
+# RSS ceiling in MiB of low-memory planning requests, none if not set
+MAX_RSS_MIB = float(os.environ['FEPLANNER_MAX_RSS_MIB']) if os.environ.get('FEPLANNER_MAX_RSS_MIB') else None
+
+# Background workers generating RBFE inputs for planned networks; charge assignment
+# is CPU bound and not thread-safe, so a single worker by default
+rbfe_jobs = RBFEJobQueue(int(os.environ.get('FEPLANNER_RBFE_WORKERS', 1)))
+
+# Requests carrying this token in the X-Admin-Token header may use admin features
+# such as profiling; those features are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('FEPLANNER_ADMIN_TOKEN')
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def is_admin_request():
+    """Whether the request carries the configured admin token."""
+    token = request.headers.get('X-Admin-Token')
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+def compressed_json_response(payload):
+    """Serialize payload as compact JSON, compressed as negotiated through Accept-Encoding."""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding:
+            response.set_data(compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+    
+    return response
+
+@app.before_request
+def start_request_metrics():
+    """Start timing the request and count it as in progress."""
+    g.request_start = time.perf_counter()
+    # Use the URL rule, not the path, to keep the number of label values bounded
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS_IN_PROGRESS.inc(endpoint=g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the count, status and latency of the finished request."""
+    if 'request_start' in g:
+        REQUESTS_IN_PROGRESS.dec(endpoint=g.metrics_endpoint)
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=g.metrics_endpoint)
+        REQUESTS.inc(endpoint=g.metrics_endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Expose request counts, latency histograms per endpoint and per planning stage,
+    mapped pairs, cache hit rates and requests in progress in the Prometheus
+    text format.
+    """
+    return REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint to verify service is running."""
@@ -54,6 +166,24 @@ def plan_fep_map():
     - element_change: boolean (default: False) - allow changes in atom elements
     - network_type: string (default: 'minimal_spanning') - type of network to generate
     - center_ligand: string (required for radial network) - name of the ligand to use as center
+    - network_builder: string (default: 'openfe') - 'sparse' to build spanning and redundant
+      networks with the array-backed builder, which scales to thousands of ligands
+    - include_mappings: boolean (default: True) - embed every edge's atom mapping; when
+      false edges only carry scores and mapped atom counts, and mappings are fetched
+      per edge from /edge-mapping/<sdf_id>/<edge_index>
+    - layout: boolean (default: True) - add precomputed force-directed 'x'/'y'
+      coordinates to the nodes
+    - format: string (default: 'json') - 'compact' for columnar node/edge arrays with
+      mappings as paired integer arrays (see utils.network_encoding)
+    - low_memory: boolean (default: False) - plan with ligands in a serialized on-disk
+      store and pairwise mappings spilled to disk, materializing only the mappings of
+      the selected edges; uses the sparse builder's edge selection and no dense score
+      matrix, and is subject to the FEPLANNER_MAX_RSS_MIB ceiling
+    - profile: string - 'cprofile' or 'sampling' to profile this request, admin only
+      (X-Admin-Token header). The response then carries a 'profile_id', and the
+      profile is downloaded from /profiles/<profile_id>
+    
+    The response is gzip or brotli compressed when the client's Accept-Encoding allows it.
     """
     # Check if file was provided in request
     if 'file' not in request.files:
@@ -80,7 +210,8 @@ def plan_fep_map():
     
     # Securely save the file
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    # Prefix a unique ID so that concurrent uploads of the same file name do not collide
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
     file.save(filepath)
     
     try:
@@ -90,8 +221,35 @@ def plan_fep_map():
         element_change = request.form.get('element_change', 'false').lower() == 'true'
         network_type = request.form.get('network_type', 'minimal_spanning')
         center_ligand = request.form.get('center_ligand')
+        network_builder = request.form.get('network_builder', 'openfe')
+        response_format = request.form.get('format', 'json')
+        include_mappings = request.form.get('include_mappings', 'true').lower() == 'true'
+        layout = request.form.get('layout', 'true').lower() == 'true'
+        low_memory = request.form.get('low_memory', 'false').lower() == 'true'
+        profile_mode = request.form.get('profile')
         
-        print(f"Processing file with parameters: threed={threed}, max3d={max3d}, element_change={element_change}, network_type={network_type}, center_ligand={center_ligand}")
+        logger.info(
+            "Processing file with parameters: threed=%s, max3d=%s, element_change=%s, network_type=%s, center_ligand=%s, network_builder=%s, low_memory=%s",
+            threed, max3d, element_change, network_type, center_ligand, network_builder, low_memory
+        )
+        
+        if response_format not in ('json', 'compact'):
+            return jsonify({
+                'status': 'error',
+                'message': f'Unsupported response format: {response_format}'
+            }), 400
+        
+        if profile_mode:
+            if not is_admin_request():
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Profiling requires a valid admin token'
+                }), 403
+            if profile_mode not in PROFILE_MODES:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Unsupported profile mode: {profile_mode}. Allowed modes: {", ".join(PROFILE_MODES)}'
+                }), 400
         
         # Validate center_ligand for radial network
         if network_type == 'radial' and not center_ligand:
@@ -111,48 +269,85 @@ def plan_fep_map():
                 binary_content = f.read()
                 sdf_content = binary_content.decode('utf-8', errors='replace')
         
-        print(f"Read SDF file with {sdf_content.count('$$$$')} molecule blocks")
+        logger.debug("Read SDF file with %d bytes", len(sdf_content))
         
         # Generate a unique ID for this SDF file
-        import uuid
         sdf_id = str(uuid.uuid4())
         
-        # Store in the cache
-        sdf_cache[sdf_id] = sdf_content
-        print(f"Stored SDF in cache with ID: {sdf_id}")
+        # Only profile when asked to, so that regular requests pay nothing
+        profiler = RunProfiler(profile_mode) if profile_mode else None
+        with profiler or nullcontext():
+            # Process file and generate FEP+ map
+            plan = {}
+            result = process_sdf_file(filepath, threed, max3d, element_change, network_type, center_ligand, plan=plan, network_builder=network_builder, include_mappings=include_mappings, layout=layout, low_memory=low_memory, max_rss_mib=MAX_RSS_MIB)
+            if profiler is not None:
+                profile_id = str(uuid.uuid4())
+                result['profile_id'] = profile_id
+                # Removed with the plan when it is evicted
+                plan['profile_id'] = profile_id
+            
+            # Store in the caches only once planned, so that failed requests leave nothing behind
+            sdf_cache[sdf_id] = sdf_content
+            plan_cache[sdf_id] = plan
+            logger.debug("Stored SDF and plan in cache with ID: %s", sdf_id)
+            
+            # Add the SDF ID to the result
+            result['sdf_id'] = sdf_id
+            
+            with stage_timer('serialization', logger):
+                if response_format == 'compact':
+                    result['format'] = 'compact'
+                    result['network'] = encode_compact_network(result['network'])
+                response = compressed_json_response(result)
         
-        # Process file and generate FEP+ map
-        result = process_sdf_file(filepath, threed, max3d, element_change, network_type, center_ligand)
+        if profiler is not None:
+            profile_path = os.path.join(PROFILE_FOLDER, profile_id + profiler.extension)
+            profiler.dump(profile_path)
+            profile_cache[profile_id] = profile_path
+            logger.info("Stored %s profile of plan %s as %s", profile_mode, sdf_id, profile_id,
+                        extra={'profile_id': profile_id, 'sdf_id': sdf_id})
         
-        # Add the SDF ID to the result
-        result['sdf_id'] = sdf_id
+        return response
+    
+    except ProfilerBusy as e:
+        logger.warning("Profiled planning refused: %s", e)
         
-        # Clean up
-        os.remove(filepath)
+        return jsonify({
+            'status': 'error',
+            'message': 'Another request is being profiled, retry once it has finished'
+        }), 409
+    
+    except MemoryLimitExceeded as e:
+        logger.warning("Low-memory planning aborted: %s", e)
         
-        return jsonify(result)
+        return jsonify({
+            'status': 'error',
+            'message': f'Not enough memory to plan this file: {str(e)}'
+        }), 503
     
     except Exception as e:
         # Get detailed error information including traceback
         import traceback
         error_traceback = traceback.format_exc()
-        print(f"Error processing file: {str(e)}")
-        print(f"Traceback: {error_traceback}")
-        
-        # Clean up in case of error
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        logger.exception("Error processing file: %s", e)
         
         return jsonify({
             'status': 'error',
             'message': f'Error processing file: {str(e)}',
             'traceback': error_traceback
         }), 500
+    
+    finally:
+        # Clean up on every path, including the parameter validation errors
+        if os.path.exists(filepath):
+            os.remove(filepath)
 
 @app.route('/get-sdf/<sdf_id>', methods=['GET'])
 def get_sdf(sdf_id):
     """Return the SDF content for a given ID."""
-    if sdf_id not in sdf_cache:
+    sdf_content = sdf_cache.get(sdf_id)
+    record_cache_lookup('sdf', sdf_content is not None)
+    if sdf_content is None:
         return jsonify({
             'status': 'error',
             'message': 'SDF file not found. It may have expired.'
@@ -160,22 +355,362 @@ def get_sdf(sdf_id):
         
     return jsonify({
         'status': 'success',
-        'sdf_content': sdf_cache[sdf_id]
+        'sdf_content': sdf_content
+    })
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Download the profile of a planning request run with the 'profile' parameter,
+    admin only. cProfile profiles are pstats files (snakeviz, gprof2dot,
+    pstats.Stats), sampling profiles are collapsed stacks (flamegraph.pl, speedscope).
+    """
+    if not is_admin_request():
+        return jsonify({
+            'status': 'error',
+            'message': 'Downloading profiles requires a valid admin token'
+        }), 403
+    
+    profile_path = profile_cache.get(profile_id)
+    record_cache_lookup('profile', profile_path is not None)
+    if profile_path is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Profile not found. It may have expired.'
+        }), 404
+    
+    return send_file(
+        profile_path,
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=f'plan_{os.path.basename(profile_path)}'
+    )
+
+@app.route('/score-matrix/<sdf_id>', methods=['GET'])
+def score_matrix(sdf_id):
+    """
+    Return the all-pairs score and mapped-atom-count matrices of a plan as a
+    compressed NumPy .npz archive.
+
+    Optional query parameters:
+    - prune: float - only keep pairs scoring at least this value, stored as
+      sparse COO triplets instead of dense matrices (always sparse for
+      low-memory plans)
+    """
+    plan = plan_cache.get(sdf_id)
+    record_cache_lookup('plan', plan is not None)
+    if plan is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plan not found. It may have expired.'
+        }), 404
+
+    prune = request.args.get('prune', default=None, type=float)
+    matrices = plan['score_matrix']
+    if isinstance(matrices, SpilledPairs):
+        # Low-memory plans only have the scored pairs, never dense matrices
+        data = sparse_score_matrices_to_bytes(
+            matrices.names, matrices.row, matrices.col, matrices.scores,
+            matrices.n_mapped, prune=prune
+        )
+    else:
+        # Plans keep sparse pairs; dense matrices only exist for this response
+        data = matrices.to_bytes(prune=prune)
+    return send_file(
+        io.BytesIO(data),
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=f'score_matrix_{sdf_id}.npz'
+    )
+
+def get_plan_edge(sdf_id, edge_index):
+    """
+    Return the cached plan and its edge, or (None, None) if the plan or edge
+    does not exist.
+    """
+    plan = plan_cache.get(sdf_id)
+    record_cache_lookup('plan', plan is not None)
+    if plan is None or not 0 <= edge_index < len(plan['edges']):
+        return None, None
+    return plan, plan['edges'][edge_index]
+
+@app.route('/edge-mapping/<sdf_id>/<int:edge_index>', methods=['GET'])
+def edge_mapping(sdf_id, edge_index):
+    """Return the atom mapping of one edge of a plan, indexed as in the plan's edge list."""
+    _, edge = get_plan_edge(sdf_id, edge_index)
+    if edge is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Edge not found. The plan may have expired.'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'molecule_a': edge['molecule_a'],
+        'molecule_b': edge['molecule_b'],
+        'score': edge['score'],
+        'mapping': {str(k): v for k, v in edge['mapping'].items()}
+    })
+
+@app.route('/edge-mappings/<sdf_id>', methods=['GET'])
+def edge_mappings(sdf_id):
+    """
+    Return the atom mappings of all edges of a plan, aligned with the plan's
+    edge list, e.g. to export a plan requested with include_mappings=false.
+    """
+    plan = plan_cache.get(sdf_id)
+    record_cache_lookup('plan', plan is not None)
+    if plan is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plan not found. It may have expired.'
+        }), 404
+    
+    return compressed_json_response({
+        'status': 'success',
+        'mappings': [
+            {str(k): v for k, v in edge['mapping'].items()}
+            for edge in plan['edges']
+        ]
+    })
+
+@app.route('/edge-depiction/<sdf_id>/<int:edge_index>', methods=['GET'])
+def edge_depiction(sdf_id, edge_index):
+    """
+    Return a side-by-side SVG of the two ligands of an edge with the mapped core
+    highlighted. Depictions are rendered once per edge and cached with the plan.
+    """
+    plan, edge = get_plan_edge(sdf_id, edge_index)
+    if edge is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Edge not found. The plan may have expired.'
+        }), 404
+    
+    depictions = plan['edge_depictions']
+    record_cache_lookup('edge_depiction', edge_index in depictions)
+    if edge_index not in depictions:
+        try:
+            ligands = plan['ligands']
+            depictions[edge_index] = draw_mapping_svg(
+                ligands[edge['molecule_a']].to_rdkit(),
+                ligands[edge['molecule_b']].to_rdkit(),
+                edge['mapping'],
+                legends=[edge['molecule_a'], edge['molecule_b']]
+            )
+        except Exception as e:
+            import traceback
+            error_trace = traceback.format_exc()
+            logger.exception("Error generating edge depiction: %s", e)
+            return jsonify({
+                'status': 'error',
+                'message': f'Error generating SVG: {str(e)}',
+                'traceback': error_trace
+            }), 500
+    
+    return depictions[edge_index], 200, {'Content-Type': 'image/svg+xml'}
+
+def remove_hydrogens(mol):
+    """
+    Remove the hydrogen atoms from a molecule for depiction.
+    
+    Returns:
+        The heavy-atom molecule and a dict mapping old to new atom indices
+    """
+    mol = Chem.Mol(mol)
+    for atom in mol.GetAtoms():
+        atom.SetIntProp('original_index', atom.GetIdx())
+    # RemoveHs moves each H onto the H count of its neighbour, which keeps
+    # aromatic NH rings (indole, imidazole, pyrrole) kekulizable
+    heavy_mol = Chem.RemoveHs(mol)
+    return heavy_mol, {
+        atom.GetIntProp('original_index'): atom.GetIdx() for atom in heavy_mol.GetAtoms()
+    }
+
+def draw_mapping_svg(mol_a, mol_b, mapping, legends=None, width=300, height=300):
+    """
+    Draw two molecules side by side, highlighting the atoms of the mapping (a dict
+    of atom indices in mol_a to atom indices in mol_b). Hydrogens are hidden and
+    mol_b is laid out on the 2D coordinates of the mapped core of mol_a.
+    """
+    from rdkit.Chem.Draw import rdMolDraw2D
+    from rdkit.Geometry import Point2D
+    
+    mol_a, index_a = remove_hydrogens(mol_a)
+    mol_b, index_b = remove_hydrogens(mol_b)
+    core = {
+        index_a[i]: index_b[j] for i, j in mapping.items()
+        if i in index_a and j in index_b
+    }
+    
+    AllChem.Compute2DCoords(mol_a)
+    conf_a = mol_a.GetConformer()
+    coord_map = {}
+    for i, j in core.items():
+        position = conf_a.GetAtomPosition(i)
+        coord_map[j] = Point2D(position.x, position.y)
+    AllChem.Compute2DCoords(mol_b, coordMap=coord_map)
+    
+    drawer = rdMolDraw2D.MolDraw2DSVG(2 * width, height, width, height)
+    drawer.DrawMolecules(
+        [mol_a, mol_b],
+        highlightAtoms=[list(core.keys()), list(core.values())],
+        legends=legends or ['', '']
+    )
+    drawer.FinishDrawing()
+    return drawer.GetDrawingText()
+
+def run_rbfe_job(ligands, mappings, pdb_path, cofactors_path=None):
+    """
+    Generate the RBFE transformations of a planned network, as run_inputs does,
+    reusing the plan's ligands and atom mappings. Runs in a background worker.
+    
+    Returns:
+        The charged LigandNetwork and its AlchemicalNetwork
+    """
+    # Imported here: the RBFE toolchain (OpenFF, AmberTools) is only needed by jobs
+    from utils.plan_rbfe_network import gen_alchemical_network_from_mappings
+    try:
+        return gen_alchemical_network_from_mappings(mappings, ligands, pdb_path, cofactors_path)
+    finally:
+        for path in (pdb_path, cofactors_path):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+@app.route('/rbfe-jobs', methods=['POST'])
+def submit_rbfe_job():
+    """
+    Start generating the RBFE inputs of a planned network in the background.
+    
+    Expects a multipart/form-data POST request with:
+    - 'sdf_id': ID of the plan, as returned by /plan-fep-map
+    - 'pdb': PDB file of the prepared protein
+    - 'cofactors': SDF file of the prepared cofactors (optional)
+    
+    The ligands are charged and the solvent and complex transformations of
+    every planned edge are created with the plan's atom mappings. Poll
+    /rbfe-jobs/<job_id> and download the inputs from /rbfe-jobs/<job_id>/inputs.tar.gz.
+    """
+    sdf_id = request.form.get('sdf_id')
+    if not sdf_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'A plan ID (sdf_id) is required'
+        }), 400
+    
+    plan = plan_cache.get(sdf_id)
+    record_cache_lookup('plan', plan is not None)
+    if plan is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plan not found. It may have expired.'
+        }), 404
+    
+    pdb = request.files.get('pdb')
+    if pdb is None or not pdb.filename.lower().endswith('.pdb'):
+        return jsonify({
+            'status': 'error',
+            'message': 'A protein PDB file is required'
+        }), 400
+    
+    cofactors = request.files.get('cofactors')
+    if cofactors is not None and cofactors.filename == '':
+        cofactors = None
+    if cofactors is not None and not allowed_file(cofactors.filename):
+        return jsonify({
+            'status': 'error',
+            'message': f'Cofactor file type not supported. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    
+    # Stored under unique names, removed by the job once it has read them
+    pdb_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{secure_filename(pdb.filename)}')
+    pdb.save(pdb_path)
+    cofactors_path = None
+    if cofactors is not None:
+        cofactors_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{secure_filename(cofactors.filename)}')
+        cofactors.save(cofactors_path)
+    
+    mappings = [
+        (edge['molecule_a'], edge['molecule_b'], edge['mapping'], edge['score'])
+        for edge in plan['edges']
+    ]
+    # Resolve the ligands now: the plan, and the on-disk store of a low-memory
+    # plan, may be evicted before the job runs
+    ligands = {
+        name: plan['ligands'][name]
+        for name_a, name_b, _, _ in mappings for name in (name_a, name_b)
+    }
+    job = rbfe_jobs.submit(RBFEJob(sdf_id), run_rbfe_job, ligands, mappings, pdb_path, cofactors_path)
+    logger.info("Queued RBFE job %s for plan %s with %d edges", job.job_id, sdf_id, len(mappings),
+                extra={'job_id': job.job_id, 'sdf_id': sdf_id})
+    
+    return jsonify({
+        'status': 'success',
+        'job': job.to_dict()
+    }), 202
+
+@app.route('/rbfe-jobs/<job_id>', methods=['GET'])
+def rbfe_job_status(job_id):
+    """Return the state of an RBFE job: queued, running, done or failed (with its error)."""
+    job = rbfe_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job not found'
+        }), 404
+    
+    result = {'status': 'success', 'job': job.to_dict()}
+    if job.state == 'done':
+        result['job']['n_transformations'] = len(job.result[1].edges)
+    return jsonify(result)
+
+@app.route('/rbfe-jobs/<job_id>/inputs.tar.gz', methods=['GET'])
+def rbfe_job_inputs(job_id):
+    """
+    Stream the inputs of a finished RBFE job as a tar.gz archive laid out like
+    the output directory of run_inputs (ligand_network.graphml,
+    alchemical_network.json and transformations/). The archive is built while
+    it is sent, serializing one transformation at a time.
+    """
+    job = rbfe_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job not found'
+        }), 404
+    if job.state != 'done':
+        message = f'Job is {job.state}'
+        if job.error:
+            message += f': {job.error}'
+        return jsonify({
+            'status': 'error',
+            'message': message
+        }), 409
+    
+    from utils.plan_rbfe_network import iter_alchemical_network_files
+    ligand_network, alchemical_network = job.result
+    archive = stream_tar_gz(
+        iter_alchemical_network_files(alchemical_network, ligand_network),
+        prefix='alchemicalNetwork'
+    )
+    return app.response_class(archive, mimetype='application/gzip', headers={
+        'Content-Disposition': f'attachment; filename=rbfe_inputs_{job.sdf_id}.tar.gz'
     })
 
 @app.route('/molecule-svg/<sdf_id>/<int:mol_index>', methods=['GET'])
 def molecule_svg(sdf_id, mol_index):
     """Generate and return an SVG image for a specific molecule."""
-    if sdf_id not in sdf_cache:
-        print(f"SDF ID {sdf_id} not found in cache. Available IDs: {list(sdf_cache.keys())}")
+    sdf_content = sdf_cache.get(sdf_id)
+    record_cache_lookup('sdf', sdf_content is not None)
+    if sdf_content is None:
+        logger.warning("SDF ID %s not found in cache", sdf_id)
         return jsonify({
             'status': 'error',
             'message': 'SDF file not found'
         }), 404
     
     try:
-        sdf_content = sdf_cache[sdf_id]
-        print(f"Retrieved SDF content for ID {sdf_id}, length: {len(sdf_content)}")
+        logger.debug("Retrieved SDF content for ID %s, length: %d", sdf_id, len(sdf_content))
         
         # Split SDF content into individual molecules
         molecules = []
@@ -193,23 +728,23 @@ def molecule_svg(sdf_id, mol_index):
             current_mol += "$$$$\n"
             molecules.append(current_mol)
         
-        print(f"Found {len(molecules)} molecules in SDF")
+        logger.debug("Found %d molecules in SDF", len(molecules))
         
         # Check if the requested molecule index is valid
         if mol_index < 0 or mol_index >= len(molecules):
-            print(f"Molecule index {mol_index} out of range (0-{len(molecules)-1})")
+            logger.debug("Molecule index %d out of range (0-%d)", mol_index, len(molecules) - 1)
             return jsonify({
                 'status': 'error',
                 'message': f'Molecule index {mol_index} out of range (0-{len(molecules)-1})'
             }), 404
             
         mol_block = molecules[mol_index]
-        print(f"Molecule block length: {len(mol_block)}")
+        logger.debug("Molecule block length: %d", len(mol_block))
         
         # Convert MolBlock to RDKit molecule
         mol = Chem.MolFromMolBlock(mol_block)
         if mol is None:
-            print(f"Failed to parse molecule block: {mol_block[:100]}...")
+            logger.warning("Failed to parse molecule block: %s...", mol_block[:100])
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to parse molecule'
@@ -228,8 +763,7 @@ def molecule_svg(sdf_id, mol_index):
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Error generating SVG: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception("Error generating SVG: %s", e)
         return jsonify({
             'status': 'error',
             'message': f'Error generating SVG: {str(e)}',
@@ -254,7 +788,7 @@ def molecule_placeholder(name, formula):
     </svg>'''
     return svg, 200, {'Content-Type': 'image/svg+xml'}
 
-def process_sdf_file(filepath, threed=True, max3d=1.0, element_change=False, network_type='minimal_spanning', center_ligand=None):
+def process_sdf_file(filepath, threed=True, max3d=1.0, element_change=False, network_type='minimal_spanning', center_ligand=None, plan=None, network_builder='openfe', include_mappings=True, layout=True, low_memory=False, max_rss_mib=None):
     """
     Process an SDF file and generate an FEP+ map using Lomap atom mapper.
     
@@ -265,10 +799,105 @@ def process_sdf_file(filepath, threed=True, max3d=1.0, element_change=False, net
         element_change: Allow element changes in mapping
         network_type: Type of network to generate ('minimal_spanning', 'minimal_redundant', or 'radial')
         center_ligand: Name of the ligand to use as center for radial network
+        plan: Optional dict that is filled with artifacts of the run that are not
+            part of the JSON response ('score_matrix': the ScoreMatrixRecorder
+            holding the scores and mapped atom counts of all scored pairs, 'ligands' and
+            'edges' with the full atom mappings)
+        network_builder: 'openfe' to use the openfe network planners, or 'sparse' for
+            the array-backed builder that scales to thousands of ligands (radial
+            networks always use openfe)
+        include_mappings: Embed the atom mapping of every edge in the result. When False
+            edges only carry scores and mapped atom counts; the mappings are kept in
+            plan and served per edge by /edge-mapping
+        layout: Compute a force-directed layout and add 'x'/'y' coordinates to the
+            nodes (also kept in plan['layout'])
+        low_memory: Keep the ligands in an on-disk store and spill the pairwise mappings
+            to disk, materializing only the mappings of the selected edges (see
+            utils.low_memory); plan['ligands'] is then the LigandStore and
+            plan['score_matrix'] the SpilledPairs
+        max_rss_mib: RSS ceiling in MiB of low-memory planning, MemoryLimitExceeded
+            is raised when it is exceeded
     
     Returns:
         Dictionary containing the FEP+ mapping results
     """
+    # Create the atom mapper with specified parameters
+    mapper = LomapAtomMapper(
+        threed=threed,
+        max3d=max3d,
+        element_change=element_change
+    )
+    
+    logger.debug("Mapper created: %s", mapper)
+    
+    if low_memory:
+        ligands, score_matrix, edges, edge_mappings, nodes = plan_low_memory(
+            filepath, mapper, network_type, center_ligand, include_mappings, max_rss_mib
+        )
+    else:
+        with stage_timer('parse', logger):
+            ligand_list, rdkit_mols = load_ligands(filepath)
+        ligands = {ligand.name: ligand for ligand in ligand_list}
+        
+        # Record every pairwise score the planners compute, not only the kept edges
+        score_matrix = ScoreMatrixRecorder(
+            [ligand.name for ligand in ligand_list],
+            openfe.lomap_scorers.default_lomap_score
+        )
+        
+        # Includes the pairwise mapping and scoring done by the planners
+        with stage_timer('network', logger):
+            network = generate_network(ligand_list, [mapper], score_matrix, network_type, center_ligand, network_builder)
+        PAIRS_MAPPED.inc(score_matrix.n_scored)
+        
+        with stage_timer('edges', logger):
+            edges, edge_mappings = extract_edges(network, include_mappings)
+        
+        with stage_timer('nodes', logger):
+            nodes = extract_nodes(ligand_list, rdkit_mols)
+    
+    if plan is not None:
+        plan['score_matrix'] = score_matrix
+        # Kept server-side for /edge-mapping and /edge-depiction
+        plan['ligands'] = ligands
+        plan['edges'] = [
+            dict(edge_data, mapping=mapping)
+            for edge_data, mapping in zip(edges, edge_mappings)
+        ]
+        plan['edge_depictions'] = {}
+    
+    if layout:
+        # Precompute node positions so the browser does not have to run the physics
+        index = {node['name']: i for i, node in enumerate(nodes)}
+        with stage_timer('layout', logger):
+            positions = force_directed_layout(
+                len(nodes),
+                [index[edge['molecule_a']] for edge in edges],
+                [index[edge['molecule_b']] for edge in edges],
+                weights=[edge['score'] for edge in edges]
+            )
+        for node, (x, y) in zip(nodes, positions.tolist()):
+            node['x'] = round(x, 1)
+            node['y'] = round(y, 1)
+        if plan is not None:
+            plan['layout'] = positions
+    
+    # Return the network as a JSON-serializable dictionary
+    return {
+        'status': 'success',
+        'network': {
+            'nodes': nodes,
+            'edges': edges
+        }
+    }
+
+def load_ligands(filepath):
+    """
+    Load the ligands of an SDF file.
+    
+    Returns:
+        The SmallMoleculeComponents and the RDKit molecules they were created from
+    """
     # Load molecules from SDF file
     ligands = []
     rdkit_mols = []  # Store the RDKit molecules
@@ -283,29 +912,101 @@ def process_sdf_file(filepath, threed=True, max3d=1.0, element_change=False, net
     if not ligands:
         raise ValueError("No valid molecules found in the SDF file")
     
-    # Create the atom mapper with specified parameters
-    mapper = LomapAtomMapper(
-        threed=threed,
-        max3d=max3d,
-        element_change=element_change
-    )
+    return ligands, rdkit_mols
+
+def plan_low_memory(filepath, mapper, network_type='minimal_spanning', center_ligand=None, include_mappings=True, max_rss_mib=None):
+    """
+    Low-memory counterpart of the parse, network, edges and nodes stages of
+    process_sdf_file.
+    
+    The ligands are streamed into a LigandStore and the pairwise mappings are
+    spilled to disk, both in a new directory under the upload folder; only
+    the mappings of the selected edges are read back.
     
-    # Debug print the mapper
-    print(f"Mapper created: {mapper}")
+    Returns:
+        The LigandStore, the SpilledPairs, the edge dicts, the atom mapping of
+        each edge and the node dicts
+    """
+    directory = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    guard = MemoryGuard(max_rss_mib)
+    store = None
     
+    try:
+        with stage_timer('parse', logger):
+            store = LigandStore.from_sdf(filepath, directory, guard)
+        
+        with stage_timer('network', logger):
+            pairs, selected = plan_low_memory_network(
+                store, [mapper], openfe.lomap_scorers.default_lomap_score, directory,
+                network_type, center_ligand, guard=guard
+            )
+        PAIRS_MAPPED.inc(pairs.n_scored)
+        logger.info("Network created with %d edges from %d scored pairs", len(selected), len(pairs))
+        
+        with stage_timer('edges', logger):
+            edges = []
+            edge_mappings = []
+            for k in selected.tolist():
+                i, j, score = pairs.pair(k)
+                mapping = pairs.mapping(k)
+                edge_data = {
+                    'molecule_a': store.names[i],
+                    'molecule_b': store.names[j],
+                    'num_mapped': len(mapping),
+                    'score': score
+                }
+                if include_mappings:
+                    edge_data['mapping'] = {str(a): b for a, b in mapping.items()}
+                edges.append(edge_data)
+                edge_mappings.append(mapping)
+            # The plan keeps the edge mappings; the spill file of all pairs is
+            # not needed anymore and would stay on disk as long as the plan
+            pairs.discard_mappings()
+        
+        with stage_timer('nodes', logger):
+            nodes = []
+            for i, name in enumerate(store.names):
+                mol = store.mol(i)
+                nodes.append(describe_ligand(name, mol, mol))
+                guard.check()
+    except BaseException:
+        # Leave nothing behind on failure, a MemoryLimitExceeded included
+        if store is not None:
+            store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    
+    return store, pairs, edges, edge_mappings, nodes
+
+def generate_network(ligands, mappers, scorer, network_type='minimal_spanning', center_ligand=None, network_builder='openfe'):
+    """
+    Generate a ligand network of the given type (see process_sdf_file for the options).
+    
+    Returns:
+        The openfe LigandNetwork
+    """
     try:
         # Generate the network based on selected type
-        if network_type == 'minimal_spanning':
+        if network_builder == 'sparse' and network_type in ('minimal_spanning', 'minimal_redundant'):
+            network = generate_sparse_network(
+                ligands=ligands,
+                mappers=mappers,
+                scorer=scorer,
+                network_type=network_type
+            )
+        elif network_builder not in ('openfe', 'sparse'):
+            raise ValueError(f"Unsupported network builder: {network_builder}")
+        elif network_type == 'minimal_spanning':
             network = generate_minimal_spanning_network(
                 ligands=ligands,
-                scorer=openfe.lomap_scorers.default_lomap_score,
-                mappers=[mapper]
+                scorer=scorer,
+                mappers=mappers
             )
         elif network_type == 'minimal_redundant':
             network = generate_minimal_redundant_network(
                 ligands=ligands,
-                scorer=openfe.lomap_scorers.default_lomap_score,
-                mappers=[mapper]
+                scorer=scorer,
+                mappers=mappers
             )
         elif network_type == 'radial':
             # Find the center ligand
@@ -321,135 +1022,155 @@ def process_sdf_file(filepath, threed=True, max3d=1.0, element_change=False, net
             network = generate_radial_network(
                 ligands=ligands,
                 central_ligand=center_ligand_component,
-                scorer=openfe.lomap_scorers.default_lomap_score,
-                mappers=[mapper]
+                scorer=scorer,
+                mappers=mappers
             )
         else:
             raise ValueError(f"Unsupported network type: {network_type}")
     except Exception as e:
-        print(f"Error generating network: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("Error generating network: %s", e)
         raise ValueError(f"Failed to generate network: {str(e)}")
 
-    print(f"Network created with {len(network.edges)} edges")
+    logger.info("Network created with %d edges", len(network.edges))
     
+    return network
+
+def extract_edges(network, include_mappings=True):
+    """
+    Convert the edges of a ligand network to JSON-serializable dicts.
+    
+    Returns:
+        The edge dicts and, aligned with them, the atom mapping of each edge
+    """
     # Extract edges and mappings from the network
     edges = []
+    edge_mappings = []
     for i, edge in enumerate(network.edges):
-        print(edge)
+        logger.debug("Edge %s", edge)
         mol_a = edge.componentA.name
         mol_b = edge.componentB.name
         
-        
-        #print(f"Processing edge {i}: {mol_a} -> {mol_b}")
-        #print(f"Edge type: {type(edge).__name__}")
-        #print(f"Edge attributes: {dir(edge)}")
-        
         # For older versions of OpenFE (before 0.15.0), the edge itself may be the mapping
         try:
             # Try various attribute paths to find the mapping
             if hasattr(edge, 'componentA_to_componentB'):
                 # Try to access the mapping directly from the edge
-                print("Using edge.componentA_to_componentB")
+                logger.debug("Using edge.componentA_to_componentB")
                 mapping = edge.componentA_to_componentB
             elif hasattr(edge, 'mapping') and hasattr(edge.mapping, 'componentA_to_componentB'):
-                print("Using edge.mapping.componentA_to_componentB")
+                logger.debug("Using edge.mapping.componentA_to_componentB")
                 mapping = edge.mapping.componentA_to_componentB
             elif hasattr(edge, 'atom_mapping') and hasattr(edge.atom_mapping, 'componentA_to_componentB'):
-                print("Using edge.atom_mapping.componentA_to_componentB")
+                logger.debug("Using edge.atom_mapping.componentA_to_componentB")
                 mapping = edge.atom_mapping.componentA_to_componentB
             elif hasattr(edge, 'transformation') and hasattr(edge.transformation, 'componentA_to_componentB'):
-                print("Using edge.transformation.componentA_to_componentB")
+                logger.debug("Using edge.transformation.componentA_to_componentB")
                 mapping = edge.transformation.componentA_to_componentB
             else:
                 # Default to an empty dict if we can't find the mapping
-                print(f"Could not find mapping path. Available edge attributes: {dir(edge)}")
+                logger.warning("Could not find mapping path. Available edge attributes: %s", dir(edge))
                 if hasattr(edge, 'atom_mapping'):
-                    print(f"atom_mapping attributes: {dir(edge.atom_mapping)}")
+                    logger.warning("atom_mapping attributes: %s", dir(edge.atom_mapping))
                 mapping = {}
         except Exception as e:
-            print(f"Error accessing mapping: {str(e)}")
+            logger.warning("Error accessing mapping: %s", e)
             mapping = {}
         
-        # Convert mapping (dict with int keys) to string keys for JSON serialization
-        serializable_mapping = {str(k): v for k, v in mapping.items()}
-        
         # Try to calculate the score
         try:
             # Check for score in annotations dictionary
             if hasattr(edge, 'annotations') and 'score' in edge.annotations:
-                print("Using edge.annotations['score']")
+                logger.debug("Using edge.annotations['score']")
                 score = edge.annotations['score']
             # For newer versions of OpenFE, score may be a method or property on the edge
             elif hasattr(edge, 'score'):
-                print("Using edge.score")
+                logger.debug("Using edge.score")
                 if callable(edge.score):
                     score = edge.score()
                 else:
                     score = edge.score
             # Otherwise try to calculate it using the lomap scorer
             elif hasattr(edge, 'mapping'):
-                print("Calculating score with edge.mapping")
+                logger.debug("Calculating score with edge.mapping")
                 score = openfe.lomap_scorers.default_lomap_score(edge.mapping)
             elif hasattr(edge, 'atom_mapping'):
-                print("Calculating score with edge.atom_mapping")
+                logger.debug("Calculating score with edge.atom_mapping")
                 score = openfe.lomap_scorers.default_lomap_score(edge.atom_mapping)
             else:
                 # Default to a placeholder score
-                print("Using default score of 0.5")
+                logger.debug("Using default score of 0.5")
                 score = 0.5
         except Exception as e:
-            print(f"Error calculating score: {str(e)}")
+            logger.warning("Error calculating score: %s", e)
             score = 0.5
         
-        edges.append({
+        edge_data = {
             'molecule_a': mol_a,
             'molecule_b': mol_b,
-            'mapping': serializable_mapping,
+            'num_mapped': len(mapping),
             'score': score
-        })
+        }
+        if include_mappings:
+            # Convert mapping (dict with int keys) to string keys for JSON serialization
+            edge_data['mapping'] = {str(k): v for k, v in mapping.items()}
+        edges.append(edge_data)
+        edge_mappings.append(mapping)
     
+    return edges, edge_mappings
+
+def extract_nodes(ligands, rdkit_mols):
+    """
+    Describe each ligand by name, atom count, molecular formula and SMILES.
+    
+    Returns:
+        List of JSON-serializable node dicts
+    """
     # Extract nodes (molecules) from the network
     nodes = []
     for i, ligand in enumerate(ligands):
-        # Calculate molecular formula from atom counts
-        rdmol = ligand.to_rdkit()
-        atom_dict = {}
-        for atom in rdmol.GetAtoms():
-            symbol = atom.GetSymbol()
-            atom_dict[symbol] = atom_dict.get(symbol, 0) + 1
-        
-        # Format the molecular formula
-        formula = ''
-        for symbol in sorted(atom_dict.keys()):
-            count = atom_dict[symbol]
-            if count == 1:
-                formula += symbol
-            else:
-                formula += f"{symbol}{count}"
-        
-        # Generate SMILES string
-        try:
-            smiles = Chem.MolToSmiles(rdkit_mols[i])
-        except:
-            # If original molecule isn't available, use regenerated one
-            smiles = Chem.MolToSmiles(rdmol)
-                
-        nodes.append({
-            'name': ligand.name,
-            'num_atoms': rdmol.GetNumAtoms(),
-            'formula': formula,
-            'smiles': smiles
-        })
+        nodes.append(describe_ligand(ligand.name, ligand.to_rdkit(), rdkit_mols[i]))
+    
+    return nodes
+
+def describe_ligand(name, rdmol, original_mol):
+    """
+    Describe one ligand for extract_nodes.
+    
+    Args:
+        name: Ligand name
+        rdmol: RDKit molecule of the ligand's component, used for the formula and atom count
+        original_mol: RDKit molecule read from the SDF, used for the SMILES
+    
+    Returns:
+        JSON-serializable node dict
+    """
+    # Calculate molecular formula from atom counts
+    atom_dict = {}
+    for atom in rdmol.GetAtoms():
+        symbol = atom.GetSymbol()
+        atom_dict[symbol] = atom_dict.get(symbol, 0) + 1
+    
+    # Format the molecular formula
+    formula = ''
+    for symbol in sorted(atom_dict.keys()):
+        count = atom_dict[symbol]
+        if count == 1:
+            formula += symbol
+        else:
+            formula += f"{symbol}{count}"
+    
+    # Generate SMILES string
+    try:
+        smiles = Chem.MolToSmiles(original_mol)
+    except:
+        # If original molecule isn't available, use regenerated one
+        smiles = Chem.MolToSmiles(rdmol)
     
-    # Return the network as a JSON-serializable dictionary
     return {
-        'status': 'success',
-        'network': {
-            'nodes': nodes,
-            'edges': edges
-        }
+        'name': name,
+        'num_atoms': rdmol.GetNumAtoms(),
+        'formula': formula,
+        'smiles': smiles
     }
 
 @app.route('/', methods=['GET'])
@@ -469,7 +1190,7 @@ def molecule_svg_from_smiles():
             }), 400
         
         smiles = data['smiles']
-        print(f"Generating SVG for SMILES: {smiles}")
+        logger.debug("Generating SVG for SMILES: %s", smiles)
         
         # Optional parameters
         width = data.get('width', 300)
@@ -508,8 +1229,7 @@ def molecule_svg_from_smiles():
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Error generating SVG from SMILES: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception("Error generating SVG from SMILES: %s", e)
         return jsonify({
             'status': 'error',
             'message': f'Error generating SVG: {str(e)}',
@@ -520,7 +1240,7 @@ def molecule_svg_from_smiles():
 def molecule_svg_from_smiles_get(smiles):
     """Generate and return an SVG image for a molecule from a SMILES string using GET method."""
     try:
-        print(f"Generating SVG for SMILES: {smiles}")
+        logger.debug("Generating SVG for SMILES: %s", smiles)
         
         # Parse parameters from query string
         width = request.args.get('width', default=300, type=int)
@@ -559,8 +1279,7 @@ def molecule_svg_from_smiles_get(smiles):
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Error generating SVG from SMILES: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception("Error generating SVG from SMILES: %s", e)
         return jsonify({
             'status': 'error',
             'message': f'Error generating SVG: {str(e)}',
@@ -568,5 +1287,6 @@ def molecule_svg_from_smiles_get(smiles):
         }), 500
 
 if __name__ == '__main__':
-    print("Starting FEP+ Mapping Service...")
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    configure_logging()
+    logger.info("Starting FEP+ Mapping Service...")
+    app.run(host='0.0.0.0', port=int(os.environ.get('FEPLANNER_PORT', 5001)), debug=False)
\ No newline at end of file
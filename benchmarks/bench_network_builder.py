@@ -0,0 +1,98 @@
+"""
+Benchmark the graph construction of the minimal spanning / redundant
+networks: openfe's networkx based approach against the array-backed builder
+in utils.sparse_network.
+
+Scores are synthetic, so only the network construction is timed; the
+pairwise mapping itself is identical for both builders.
+
+    python -m benchmarks.bench_network_builder --sizes 100 500 1000 2000
+"""
+import argparse
+import json
+import time
+
+import networkx as nx
+import numpy as np
+
+from utils.sparse_network import (
+    PairwiseMappings,
+    minimal_spanning_edges,
+    minimal_redundant_edges,
+)
+
+
+def random_pairs(n_ligands, density, seed):
+    """All pairs (or a random fraction of them) with uniform random scores."""
+    rng = np.random.default_rng(seed)
+    row, col = np.triu_indices(n_ligands, k=1)
+    if density < 1.0:
+        keep = rng.random(len(row)) < density
+        row, col = row[keep], col[keep]
+    scores = rng.random(len(row))
+    return PairwiseMappings(n_ligands, row, col, scores, [None] * len(row))
+
+
+def networkx_edges(pairs, mst_num):
+    """Mirror of openfe's planners: a MultiGraph with negated scores."""
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(range(pairs.n_ligands))
+    for k, (a, b, score) in enumerate(zip(pairs.row.tolist(), pairs.col.tolist(),
+                                          pairs.scores.tolist())):
+        graph.add_edge(a, b, weight=-score, object=k)
+
+    selected = []
+    for _ in range(mst_num):
+        min_edges = list(nx.minimum_spanning_edges(graph, data=True, keys=True))
+        selected.extend(d['object'] for _, _, _, d in min_edges)
+        graph.remove_edges_from((a, b, key) for a, b, key, _ in min_edges)
+    return np.array(sorted(selected))
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(sizes, density, seed):
+    results = []
+    for n_ligands in sizes:
+        pairs = random_pairs(n_ligands, density, seed)
+        for network_type, mst_num in (('minimal_spanning', 1), ('minimal_redundant', 2)):
+            if mst_num == 1:
+                sparse, sparse_time = timed(minimal_spanning_edges, pairs)
+            else:
+                sparse, sparse_time = timed(minimal_redundant_edges, pairs, mst_num=mst_num)
+            reference, networkx_time = timed(networkx_edges, pairs, mst_num)
+
+            # Random float scores have no ties, so both must pick the same edges
+            same_score = np.isclose(pairs.scores[sparse].sum(), pairs.scores[reference].sum())
+            results.append({
+                'n_ligands': n_ligands,
+                'n_pairs': len(pairs),
+                'network_type': network_type,
+                'networkx_seconds': networkx_time,
+                'sparse_seconds': sparse_time,
+                'speedup': networkx_time / sparse_time,
+                'same_total_score': bool(same_score),
+            })
+            print(f"{n_ligands:>6} ligands {len(pairs):>9} pairs {network_type:<18} "
+                  f"networkx {networkx_time:8.3f}s  sparse {sparse_time:8.3f}s  "
+                  f"x{networkx_time / sparse_time:6.1f}  match={bool(same_score)}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 2000])
+    parser.add_argument('--density', type=float, default=1.0,
+                        help="Fraction of all pairs that have a mapping")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.density, args.seed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,379 @@
+"""
+Load test the Flask service with concurrent simulated users.
+
+Starts ``app.py`` as a local server (or targets a running one with ``--url``),
+then keeps ``--concurrency`` workers busy for ``--duration`` seconds, each
+replaying a weighted mix of plan uploads of synthetic ligand series, molecule
+and edge depictions and ``/get-sdf`` fetches. Reports throughput, latency
+percentiles and error rates per request kind, and the server's resident memory
+over time, read from ``/proc`` (Linux only).
+
+    python -m benchmarks.load_test --concurrency 16 --duration 120 --ligands 10 50
+    python -m benchmarks.load_test --mix plan=1,smiles_svg=10 --output load.json
+"""
+import argparse
+import gzip
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+import numpy as np
+
+from benchmarks.synthetic_ligands import generate_series, write_sdf
+
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Default relative frequency of each request kind, roughly what the web
+# interface issues: one plan, then many node tooltips and a few edge clicks
+DEFAULT_MIX = {
+    'plan': 1,
+    'smiles_svg': 10,
+    'molecule_svg': 2,
+    'edge_depiction': 3,
+    'get_sdf': 1,
+}
+
+
+class Plans:
+    """Thread-safe pool of the plans created so far, for the follow-up requests."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._plans = []
+
+    def add(self, plan):
+        with self._lock:
+            self._plans.append(plan)
+
+    def choice(self, rng):
+        with self._lock:
+            return rng.choice(self._plans)
+
+
+class Results:
+    """Thread-safe record of (kind, start, seconds, status, ok) per request."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def add(self, kind, start, seconds, status, ok):
+        with self._lock:
+            self.records.append((kind, start, seconds, status, ok))
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(
+                f"Unknown request kind {kind!r}, choose from {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def multipart(fields, files):
+    """Encode form fields and ``{name: (filename, bytes)}`` files as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def fetch(url, data=None, content_type=None, timeout=600):
+    """Issue a request like a browser would; return (status, decoded body)."""
+    request = urllib.request.Request(url, data=data, headers={'Accept-Encoding': 'gzip'})
+    if content_type is not None:
+        request.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, body = response.status, response.read()
+            encoding = response.headers.get('Content-Encoding')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    return status, body
+
+
+def upload_plan(base_url, sdf, args):
+    """Plan the series like the web interface does; return (status, plan or None)."""
+    body, content_type = multipart(
+        {'network_type': 'minimal_spanning', 'network_builder': args.network_builder,
+         'format': 'compact', 'include_mappings': 'false'},
+        {'file': (sdf['filename'], sdf['data'])},
+    )
+    status, response = fetch(base_url + '/plan-fep-map', body, content_type)
+    if status != 200:
+        return status, None
+    result = json.loads(response)
+    network = result['network']
+    return status, {
+        'sdf_id': result['sdf_id'],
+        'smiles': network['nodes']['smiles'],
+        'n_edges': len(network['edges']['a']),
+    }
+
+
+def make_request(kind, base_url, plans, series, rng, args):
+    """Issue one request of the given kind; return its HTTP status."""
+    if kind == 'plan':
+        status, plan = upload_plan(base_url, rng.choice(series), args)
+        if plan is not None:
+            plans.add(plan)
+        return status
+
+    plan = plans.choice(rng)
+    if kind == 'smiles_svg':
+        smiles = urllib.parse.quote(rng.choice(plan['smiles']), safe='')
+        path = f'/molecule-svg-from-smiles/{smiles}?width=150&height=150'
+    elif kind == 'molecule_svg':
+        path = f"/molecule-svg/{plan['sdf_id']}/{rng.randrange(len(plan['smiles']))}"
+    elif kind == 'edge_depiction':
+        path = f"/edge-depiction/{plan['sdf_id']}/{rng.randrange(max(plan['n_edges'], 1))}"
+    else:
+        path = f"/get-sdf/{plan['sdf_id']}"
+    status, _ = fetch(base_url + path)
+    return status
+
+
+def worker(index, base_url, plans, series, results, deadline, args):
+    rng = random.Random(args.seed + index)
+    kinds = list(args.mix)
+    weights = [args.mix[kind] for kind in kinds]
+    while time.monotonic() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        start = time.monotonic()
+        try:
+            status = make_request(kind, base_url, plans, series, rng, args)
+        except Exception as e:
+            # Connection errors, timeouts, truncated or malformed responses
+            # (http.client.HTTPException is not an OSError); recording them
+            # instead of letting the worker die keeps the concurrency constant
+            status = type(e).__name__
+        seconds = time.monotonic() - start
+        results.add(kind, start, seconds, status, status == 200)
+
+
+def read_rss(pid):
+    """Resident set size of a process in MiB, or None once it has exited."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        return None
+    return None
+
+
+def sample_rss(pid, interval, stop, samples):
+    """Append (time, RSS in MiB) of ``pid`` to ``samples`` every ``interval`` seconds."""
+    while not stop.wait(interval):
+        rss = read_rss(pid)
+        if rss is not None:
+            samples.append((time.monotonic(), rss))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, log_path):
+    """Start app.py as the container does, on ``port``; return the process once healthy."""
+    env = dict(os.environ, FEPLANNER_PORT=str(port))
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=REPO_ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}, see {log_path}")
+        try:
+            if fetch(f'http://127.0.0.1:{port}/health', timeout=1)[0] == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy, see {log_path}")
+
+
+def percentiles(seconds):
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+    return {'p50': p50, 'p95': p95, 'p99': p99, 'max': max(seconds)}
+
+
+def summarize(records, elapsed):
+    """Per request kind and overall: count, throughput, error rate and latency percentiles."""
+    by_kind = {}
+    for kind, _, seconds, status, ok in records:
+        by_kind.setdefault(kind, []).append((seconds, status, ok))
+    by_kind['total'] = [(seconds, status, ok) for _, _, seconds, status, ok in records]
+
+    summary = {}
+    for kind, entries in by_kind.items():
+        if not entries:
+            continue
+        errors = {}
+        for _, status, ok in entries:
+            if not ok:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        summary[kind] = dict(
+            count=len(entries),
+            throughput=len(entries) / elapsed,
+            error_rate=sum(errors.values()) / len(entries),
+            errors=errors,
+            **percentiles([seconds for seconds, _, _ in entries]),
+        )
+    return summary
+
+
+def timeline(records, rss_samples, start, interval):
+    """Requests, errors and server RSS per ``interval`` seconds of the run."""
+    rows = {}
+    for _, t, seconds, _, ok in records:
+        # Attribute each request to the interval in which it completed
+        row = rows.setdefault(int((t + seconds - start) // interval), {'requests': 0, 'errors': 0, 'rss_mib': None})
+        row['requests'] += 1
+        row['errors'] += not ok
+    for t, rss in rss_samples:
+        row = rows.setdefault(int((t - start) // interval), {'requests': 0, 'errors': 0, 'rss_mib': None})
+        row['rss_mib'] = max(rss, row['rss_mib'] or 0)
+    return [dict(t=index * interval, **rows[index]) for index in sorted(rows)]
+
+
+def print_report(summary, rows, interval):
+    print(f"\n{'kind':<16} {'count':>7} {'req/s':>8} {'errors':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, s in summary.items():
+        print(f"{kind:<16} {s['count']:>7} {s['throughput']:>8.2f} {s['error_rate']:>7.1%} "
+              f"{s['p50'] * 1e3:>9.1f} {s['p95'] * 1e3:>9.1f} {s['p99'] * 1e3:>9.1f} {s['max'] * 1e3:>9.1f}")
+        if s['errors']:
+            print(f"{'':<16} errors: {s['errors']}")
+
+    print(f"\n{'t (s)':>7} {'req/s':>8} {'errors':>7} {'RSS MiB':>9}")
+    for row in rows:
+        rss = f"{row['rss_mib']:9.1f}" if row['rss_mib'] is not None else f"{'-':>9}"
+        print(f"{row['t']:>7.0f} {row['requests'] / interval:>8.2f} {row['errors']:>7} {rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Number of simulated users issuing requests back to back")
+    parser.add_argument('--duration', type=float, default=60,
+                        help="Seconds to run the load for, after the warm-up plans")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Relative weights of the request kinds, e.g. plan=1,smiles_svg=10 "
+                             f"(kinds: {', '.join(DEFAULT_MIX)})")
+    parser.add_argument('--ligands', type=int, nargs='+', default=[10, 50],
+                        help="Sizes of the synthetic ligand series uploaded as plans")
+    parser.add_argument('--network-builder', choices=['openfe', 'sparse'], default='openfe')
+    parser.add_argument('--url', default=None,
+                        help="Load test a running server instead of starting app.py")
+    parser.add_argument('--pid', type=int, default=None,
+                        help="Process ID of the server given with --url, to record its RSS")
+    parser.add_argument('--interval', type=float, default=5,
+                        help="Seconds per row of the throughput and RSS timeline")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=pathlib.Path, default=None,
+                        help="Write the summary, timeline and arguments to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = pathlib.Path(workdir)
+        series = []
+        for n_ligands in args.ligands:
+            path = workdir / f'ligands_{n_ligands}.sdf'
+            write_sdf(generate_series(n_ligands, args.seed), path)
+            series.append({'filename': path.name, 'data': path.read_bytes()})
+
+        process = None
+        if args.url is None:
+            port = free_port()
+            process = start_server(port, workdir / 'server.log')
+            base_url, pid = f'http://127.0.0.1:{port}', process.pid
+        else:
+            base_url, pid = args.url.rstrip('/'), args.pid
+
+        try:
+            # Warm up with one plan per series, so that follow-up requests have targets
+            plans = Plans()
+            for sdf in series:
+                status, plan = upload_plan(base_url, sdf, args)
+                if plan is None:
+                    raise RuntimeError(f"Warm-up plan of {sdf['filename']} failed with status {status}")
+                plans.add(plan)
+
+            results = Results()
+            rss_samples = []
+            stop = threading.Event()
+            start = time.monotonic()
+            deadline = start + args.duration
+            if pid is not None:
+                rss_thread = threading.Thread(target=sample_rss, daemon=True,
+                                              args=(pid, min(args.interval, 1.0), stop, rss_samples))
+                rss_thread.start()
+            workers = [
+                threading.Thread(target=worker, daemon=True,
+                                 args=(index, base_url, plans, series, results, deadline, args))
+                for index in range(args.concurrency)
+            ]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.monotonic() - start
+            stop.set()
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    summary = summarize(results.records, elapsed)
+    rows = timeline(results.records, rss_samples, start, args.interval)
+    print_report(summary, rows, args.interval)
+
+    if args.output is not None:
+        report = {
+            'arguments': {
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'mix': args.mix,
+                'ligands': args.ligands,
+                'network_builder': args.network_builder,
+                'seed': args.seed,
+            },
+            'elapsed': elapsed,
+            'summary': summary,
+            'timeline': rows,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Time FEP map planning and RBFE input generation on synthetic congeneric
+series of increasing size.
+
+Every stage of ``process_sdf_file`` and ``run_inputs`` is timed separately:
+parsing, pairwise mapping, each network type, edge and node metadata,
+layout, JSON serialization, partial charges and transformation writing.
+Results are written as JSON and can be compared against a stored baseline:
+
+    python -m benchmarks.run_benchmarks --charge-backend stub --output results.json
+    python -m benchmarks.run_benchmarks --charge-backend stub --baseline benchmarks/baseline.json
+
+Everything runs offline: ligands are enumerated with RDKit and, unless
+``--pdb`` is given, the protein is a small synthetic peptide.
+"""
+import argparse
+import itertools
+import json
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from rdkit import Chem, rdBase
+from rdkit.Chem import AllChem
+import openfe
+from openfe.setup import LomapAtomMapper
+from openff.units import unit
+
+import app
+from benchmarks.synthetic_ligands import generate_series, write_sdf
+from utils import plan_rbfe_network
+from utils.layout import force_directed_layout
+from utils.network_encoding import encode_compact_network
+from utils.sparse_network import score_pairs
+
+
+NETWORKS = [
+    ('minimal_spanning', 'openfe'),
+    ('minimal_spanning', 'sparse'),
+    ('minimal_redundant', 'openfe'),
+    ('minimal_redundant', 'sparse'),
+    ('radial', 'openfe'),
+]
+
+
+class StageTimer:
+    """Collects wall-clock timings of named stages for one series size."""
+    def __init__(self, n_ligands):
+        self.n_ligands = n_ligands
+        self.results = []
+
+    @contextmanager
+    def stage(self, name, **info):
+        start = time.perf_counter()
+        yield info
+        seconds = time.perf_counter() - start
+        self.results.append(dict(n_ligands=self.n_ligands, stage=name, seconds=seconds, **info))
+        print(f"{self.n_ligands:>6} ligands  {name:<32} {seconds:10.3f}s")
+
+
+class ReplayMapper:
+    """
+    Mapper that replays the mappings of the pairwise mapping stage, so that
+    the network stages only time network construction.
+    """
+    def __init__(self, ligands, pairs):
+        self.mappings = {}
+        for i, j, mapping in zip(pairs.row.tolist(), pairs.col.tolist(), pairs.mappings):
+            a, b = ligands[i], ligands[j]
+            self.mappings[(a.name, b.name)] = mapping
+            self.mappings[(b.name, a.name)] = openfe.LigandAtomMapping(
+                componentA=b,
+                componentB=a,
+                componentA_to_componentB=mapping.componentB_to_componentA,
+            )
+
+    def suggest_mappings(self, componentA, componentB):
+        mapping = self.mappings.get((componentA.name, componentB.name))
+        if mapping is not None:
+            yield mapping
+
+
+def sample_pairs(n_ligands, max_pairs, seed):
+    """
+    All ligand pairs, or at most ``max_pairs`` of them: a star around ligand 0
+    (so every network type stays connected) plus random other pairs.
+    """
+    n_all = n_ligands * (n_ligands - 1) // 2
+    if max_pairs is None or n_all <= max_pairs:
+        return list(itertools.combinations(range(n_ligands), 2))
+
+    pairs = {(0, i) for i in range(1, n_ligands)}
+    rng = random.Random(seed)
+    while len(pairs) < max(max_pairs, n_ligands - 1):
+        i, j = sorted(rng.sample(range(n_ligands), 2))
+        pairs.add((i, j))
+    return sorted(pairs)
+
+
+def stub_charges(smc):
+    """
+    Stub charge backend: spread the formal charge evenly over the atoms.
+    Exercises the same OpenFF round trip as gen_charges without AM1BCC.
+    """
+    offmol = smc.to_openff()
+    total_charge = offmol.total_charge.m_as(unit.elementary_charge)
+    offmol.partial_charges = np.full(offmol.n_atoms, total_charge / offmol.n_atoms) * unit.elementary_charge
+    return openfe.SmallMoleculeComponent.from_openff(offmol)
+
+
+def synthetic_protein(sequence='GSHMKTAYIAKQRQISFVKSHFSRQ', seed=0):
+    """A small peptide with hydrogens and 3D coordinates, standing in for a protein."""
+    peptide = Chem.AddHs(Chem.MolFromSequence(sequence), addCoords=False, addResidueInfo=True)
+    AllChem.EmbedMolecule(peptide, randomSeed=seed)
+    return openfe.ProteinComponent.from_rdkit(peptide, name='synthetic_peptide')
+
+
+def benchmark_size(n_ligands, workdir, args):
+    timer = StageTimer(n_ligands)
+
+    sdf_path = workdir / f'ligands_{n_ligands}.sdf'
+    with timer.stage('generate_ligands'):
+        write_sdf(generate_series(n_ligands, args.seed), sdf_path)
+
+    with timer.stage('parse'):
+        ligands, rdkit_mols = app.load_ligands(str(sdf_path))
+
+    mapper = LomapAtomMapper(threed=True, max3d=1.0, element_change=False)
+    pair_indices = sample_pairs(n_ligands, args.max_pairs, args.seed)
+    with timer.stage('pairwise_mapping', n_pairs=len(pair_indices)) as info:
+        pairs = score_pairs(ligands, [mapper], openfe.lomap_scorers.default_lomap_score, pair_indices)
+        info['n_mapped_pairs'] = len(pairs)
+
+    # Network stages reuse the pairwise mappings and scores
+    replay = ReplayMapper(ligands, pairs)
+    scores = {}
+    for i, j, score in zip(pairs.row.tolist(), pairs.col.tolist(), pairs.scores.tolist()):
+        scores[(ligands[i].name, ligands[j].name)] = scores[(ligands[j].name, ligands[i].name)] = score
+
+    def replay_scorer(mapping):
+        return scores[(mapping.componentA.name, mapping.componentB.name)]
+
+    networks = {}
+    for network_type, builder in NETWORKS:
+        with timer.stage(f'network_{network_type}_{builder}') as info:
+            network = app.generate_network(
+                ligands, [replay], replay_scorer, network_type,
+                center_ligand=ligands[0].name, network_builder=builder
+            )
+            info['n_edges'] = len(network.edges)
+        networks[network_type] = network
+
+    network = networks['minimal_spanning']
+    with timer.stage('edge_metadata'):
+        edges, _ = app.extract_edges(network, include_mappings=True)
+
+    with timer.stage('node_metadata'):
+        nodes = app.extract_nodes(ligands, rdkit_mols)
+
+    with timer.stage('layout'):
+        index = {ligand.name: i for i, ligand in enumerate(ligands)}
+        force_directed_layout(
+            len(ligands),
+            [index[edge['molecule_a']] for edge in edges],
+            [index[edge['molecule_b']] for edge in edges],
+            weights=[edge['score'] for edge in edges]
+        )
+
+    result = {'status': 'success', 'network': {'nodes': nodes, 'edges': edges}}
+    with timer.stage('json_serialization') as info:
+        info['bytes'] = len(json.dumps(result, separators=(',', ':')))
+    with timer.stage('json_serialization_compact') as info:
+        compact = dict(result, network=encode_compact_network(result['network']))
+        info['bytes'] = len(json.dumps(compact, separators=(',', ':')))
+
+    if args.skip_rbfe:
+        return timer.results
+
+    gen_charges = stub_charges if args.charge_backend == 'stub' else plan_rbfe_network.gen_charges
+    with timer.stage('partial_charges', backend=args.charge_backend):
+        charged = {ligand.name: gen_charges(ligand) for ligand in ligands}
+
+    # Same topology as the planned network, on the charged ligands
+    charged_network = openfe.LigandNetwork([
+        openfe.LigandAtomMapping(
+            componentA=charged[edge.componentA.name],
+            componentB=charged[edge.componentB.name],
+            componentA_to_componentB=edge.componentA_to_componentB,
+        )
+        for edge in network.edges
+    ])
+
+    if args.pdb is not None:
+        protein = openfe.ProteinComponent.from_pdb_file(str(args.pdb))
+    else:
+        protein = synthetic_protein(seed=args.seed)
+
+    with timer.stage('build_transformations'):
+        alchemical_network = plan_rbfe_network.gen_alchemical_network(
+            charged_network, openfe.SolventComponent(), protein
+        )
+    with tempfile.TemporaryDirectory(dir=workdir) as output:
+        with timer.stage('write_transformations', n_transformations=len(alchemical_network.edges)):
+            plan_rbfe_network.write_alchemical_network(alchemical_network, pathlib.Path(output))
+
+    return timer.results
+
+
+def metadata():
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'openfe': openfe.__version__,
+        'rdkit': rdBase.rdkitVersion,
+        'numpy': np.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the ratio of each stage time to the baseline and return the stages
+    slower than ``1 + tolerance`` times their baseline.
+    """
+    reference = {(r['n_ligands'], r['stage']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    print(f"\n{'ligands':>7}  {'stage':<32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for r in results:
+        key = (r['n_ligands'], r['stage'])
+        if key not in reference:
+            continue
+        ratio = r['seconds'] / max(reference[key], 1e-9)
+        flag = ''
+        # Ignore noise on stages that take only a few milliseconds
+        if ratio > 1 + tolerance and r['seconds'] > 0.01:
+            regressions.append(dict(r, baseline_seconds=reference[key], ratio=ratio))
+            flag = '  REGRESSION'
+        print(f"{r['n_ligands']:>7}  {r['stage']:<32} {reference[key]:10.3f} {r['seconds']:10.3f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200, 1000])
+    parser.add_argument('--max-pairs', type=int, default=20000,
+                        help="Map at most this many pairs per size (all pairs up to 200 ligands)")
+    parser.add_argument('--charge-backend', choices=['am1bcc', 'stub'], default='am1bcc',
+                        help="'stub' skips AM1BCC, e.g. for CI")
+    parser.add_argument('--pdb', type=pathlib.Path, default=None,
+                        help="Protein PDB for the transformations, defaults to a synthetic peptide")
+    parser.add_argument('--skip-rbfe', action='store_true',
+                        help="Only benchmark planning, not charges and transformations")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=pathlib.Path, default=None,
+                        help="Write the results to this JSON file")
+    parser.add_argument('--baseline', type=pathlib.Path, default=None,
+                        help="Compare against the results stored in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative slowdown against the baseline reported as a regression")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_ligands in args.sizes:
+            results.extend(benchmark_size(n_ligands, pathlib.Path(workdir), args))
+
+    report = {'metadata': metadata(), 'arguments': {
+        'max_pairs': args.max_pairs,
+        'charge_backend': args.charge_backend,
+        'seed': args.seed,
+    }, 'results': results}
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# Makes the repository root importable (app, utils, benchmarks) when the
+# tests are run with a plain ``pytest``
@@ -0,0 +1,40 @@
+import pytest
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+from app import draw_mapping_svg, remove_hydrogens
+
+
+def embedded(smiles, name):
+    """3D molecule with explicit hydrogens, as loaded from an SDF file."""
+    mol = Chem.AddHs(Chem.MolFromSmiles(smiles))
+    AllChem.EmbedMolecule(mol, randomSeed=0)
+    mol.SetProp('_Name', name)
+    return mol
+
+
+@pytest.mark.parametrize('smiles', [
+    'c1ccc2[nH]ccc2c1',       # indole
+    'Cc1ncc[nH]1',            # imidazole
+    'Cc1cc[nH]n1',            # pyrazole
+    'c1cc[nH]c1',             # pyrrole
+])
+def test_remove_hydrogens_aromatic_nh(smiles):
+    mol = embedded(smiles, 'ligand')
+    heavy_mol, index = remove_hydrogens(mol)
+
+    assert Chem.MolToSmiles(heavy_mol) == Chem.MolToSmiles(Chem.MolFromSmiles(smiles))
+    for old, new in index.items():
+        assert mol.GetAtomWithIdx(old).GetSymbol() == heavy_mol.GetAtomWithIdx(new).GetSymbol()
+    Chem.Kekulize(Chem.Mol(heavy_mol))
+
+
+def test_draw_mapping_svg_indoles():
+    mol_a = embedded('Cc1c[nH]c2ccccc12', 'lig_a')
+    mol_b = embedded('Clc1c[nH]c2ccccc12', 'lig_b')
+    # Map the shared indole core, atom by atom, with the hydrogens included
+    core = Chem.MolFromSmarts('c1c[nH]c2ccccc12')
+    mapping = dict(zip(mol_a.GetSubstructMatch(core), mol_b.GetSubstructMatch(core)))
+
+    svg = draw_mapping_svg(mol_a, mol_b, mapping, legends=['lig_a', 'lig_b'])
+    assert '<svg' in svg
@@ -0,0 +1,69 @@
+import zlib
+
+import pytest
+
+openfe = pytest.importorskip('openfe')
+from openfe.setup import LomapAtomMapper
+from openfe.setup.ligand_network_planning import (
+    generate_minimal_redundant_network,
+    generate_minimal_spanning_network,
+)
+
+from benchmarks.synthetic_ligands import generate_series
+from utils.sparse_network import generate_sparse_network
+
+
+OPENFE_PLANNERS = {
+    'minimal_spanning': generate_minimal_spanning_network,
+    'minimal_redundant': generate_minimal_redundant_network,
+}
+
+
+@pytest.fixture(scope='module')
+def ligands():
+    return [openfe.SmallMoleculeComponent(mol) for mol in generate_series(8)]
+
+
+@pytest.fixture(scope='module')
+def mapper():
+    # The defaults of the web service
+    return LomapAtomMapper(threed=True, max3d=1.0, element_change=False)
+
+
+def tie_broken(scorer):
+    """
+    The scorer plus a tiny offset unique to each pair, so that exactly one
+    network is optimal and both builders must select the same pairs.
+    """
+    def score(mapping):
+        pair = ' '.join(sorted([mapping.componentA.name, mapping.componentB.name]))
+        return scorer(mapping) + 1e-6 * zlib.crc32(pair.encode()) / 2 ** 32
+    return score
+
+
+def edge_scores(network):
+    return {
+        frozenset([edge.componentA.name, edge.componentB.name]): edge.annotations['score']
+        for edge in network.edges
+    }
+
+
+@pytest.mark.parametrize('network_type', ['minimal_spanning', 'minimal_redundant'])
+def test_same_network_as_openfe(ligands, mapper, network_type):
+    scorer = tie_broken(openfe.lomap_scorers.default_lomap_score)
+    expected = edge_scores(OPENFE_PLANNERS[network_type](ligands=ligands, scorer=scorer, mappers=[mapper]))
+    actual = edge_scores(generate_sparse_network(ligands, [mapper], scorer, network_type))
+
+    assert actual.keys() == expected.keys()
+    for pair, score in expected.items():
+        assert actual[pair] == pytest.approx(score)
+
+
+def test_same_spanning_tree_scores_as_openfe(ligands, mapper):
+    # With tied scores the trees may differ, but every maximum spanning tree
+    # has the same sorted edge scores
+    scorer = openfe.lomap_scorers.default_lomap_score
+    expected = edge_scores(generate_minimal_spanning_network(ligands=ligands, scorer=scorer, mappers=[mapper]))
+    actual = edge_scores(generate_sparse_network(ligands, [mapper], scorer, 'minimal_spanning'))
+
+    assert sorted(actual.values()) == pytest.approx(sorted(expected.values()))
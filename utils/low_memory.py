@@ -0,0 +1,415 @@
+import collections
+import gc
+import itertools
+import os
+import sys
+import threading
+from array import array
+
+import numpy as np
+from rdkit import Chem
+import openfe
+
+try:
+    from utils.sparse_network import (
+        count_components, minimal_redundant_edges, minimal_spanning_edges
+    )
+except ImportError:  # run as a script from within utils/
+    from sparse_network import (
+        count_components, minimal_redundant_edges, minimal_spanning_edges
+    )
+
+
+class MemoryLimitExceeded(RuntimeError):
+    """Raised when the process stays above its RSS ceiling after releasing caches."""
+
+
+def current_rss_mib():
+    """Resident set size of this process in MiB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    # Not Linux: fall back to the peak RSS (KiB on Linux, bytes on macOS)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class MemoryGuard:
+    """
+    Enforce an RSS ceiling during low-memory planning.
+
+    Every ``check_interval`` calls to :meth:`check` the RSS of the process is
+    compared with the ceiling. Above it, the ``release`` callbacks (e.g.
+    dropping ligand caches) and the garbage collector are run; if the RSS is
+    still above the ceiling, MemoryLimitExceeded is raised.
+
+    Parameters
+    ----------
+    max_rss_mib : float, optional
+      The ceiling in MiB, no ceiling if None.
+    check_interval : int
+      Number of checks between two RSS measurements.
+    """
+    def __init__(self, max_rss_mib=None, check_interval=64):
+        self.max_rss_mib = max_rss_mib
+        self.check_interval = check_interval
+        self.release = []
+        self._calls = 0
+
+    def check(self):
+        if self.max_rss_mib is None:
+            return
+        self._calls += 1
+        if self._calls % self.check_interval:
+            return
+        if current_rss_mib() <= self.max_rss_mib:
+            return
+        for release in self.release:
+            release()
+        gc.collect()
+        rss = current_rss_mib()
+        if rss > self.max_rss_mib:
+            raise MemoryLimitExceeded(
+                f"Resident memory {rss:.0f} MiB exceeds the ceiling of {self.max_rss_mib:.0f} MiB"
+            )
+
+
+class LigandStore:
+    """
+    Ligands serialized as RDKit binary pickles in one file and loaded on
+    demand, with a small LRU cache of SmallMoleculeComponents.
+
+    Only the names and the file offsets are held in memory. Ligands can be
+    looked up by index (``get``, ``mol``) or, like a dict of components, by
+    name (``store[name]``).
+
+    Parameters
+    ----------
+    path : str
+      The file holding the concatenated pickles.
+    names : list[str]
+      Ligand names, in file order.
+    offsets : np.ndarray
+      Start of each pickle in the file, followed by the file size.
+    cache_size : int
+      Number of components kept in the LRU cache.
+    """
+    def __init__(self, path, names, offsets, cache_size=256):
+        self.path = path
+        self.names = list(names)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sdf(cls, sdf_path, directory, guard=None, cache_size=256):
+        """
+        Stream the molecules of an SDF file into a store in ``directory``.
+        Molecules RDKit cannot parse are skipped, as in ``load_ligands``.
+        """
+        path = os.path.join(directory, 'ligands.bin')
+        names, offsets = [], array('q', [0])
+        with open(path, 'wb') as f:
+            for mol in Chem.SDMolSupplier(sdf_path, removeHs=False):
+                if mol is None:
+                    continue
+                # Name the ligand exactly as the component would
+                names.append(openfe.SmallMoleculeComponent(mol).name)
+                f.write(mol.ToBinary(Chem.PropertyPickleOptions.AllProps))
+                offsets.append(f.tell())
+                if guard is not None:
+                    guard.check()
+        if not names:
+            raise ValueError("No valid molecules found in the SDF file")
+        return cls(path, names, np.frombuffer(offsets, dtype=np.int64), cache_size)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        return self.get(self.index[name])
+
+    def mol(self, i):
+        """The RDKit molecule of ligand ``i``, read from the store."""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        # Open the file per read rather than holding a descriptor for as long
+        # as the plan is kept; pread needs no seek, so readers need no lock
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            return Chem.Mol(os.pread(fd, end - start, start))
+        finally:
+            os.close(fd)
+
+    def get(self, i):
+        """The SmallMoleculeComponent of ligand ``i``."""
+        with self._lock:
+            if i in self._cache:
+                self._cache.move_to_end(i)
+                return self._cache[i]
+        component = openfe.SmallMoleculeComponent(self.mol(i))
+        with self._lock:
+            self._cache[i] = component
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return component
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Drop the cached components; the store holds no open file."""
+        self.clear_cache()
+
+
+class SpilledPairs:
+    """
+    Best mapping of each scored ligand pair, with the atom mappings spilled to
+    disk.
+
+    Only the ligand indices, scores and offsets into the spill file stay in
+    memory (24 bytes per pair), in growable arrays; ``finalize`` writes them
+    out as well, after which every access reads the files again and no file
+    is held open. Offers the same ``n_ligands``,
+    ``row``, ``col`` and ``scores`` as ``PairwiseMappings``, so the edge
+    selection of ``utils.sparse_network`` applies unchanged, and materializes
+    the atom mapping of a pair only on request.
+
+    Parameters
+    ----------
+    names : list[str]
+      Ligand names indexed by ``row`` and ``col``.
+    directory : str
+      Directory of the spill files.
+    buffer_size : int
+      Number of atom indices buffered before they are written out.
+    """
+    def __init__(self, names, directory, buffer_size=1 << 20):
+        self.names = list(names)
+        self.n_ligands = len(self.names)
+        self.directory = directory
+        self.buffer_size = buffer_size
+        # Number of mappings scored, including several per pair
+        self.n_scored = 0
+        self._row, self._col = array('i'), array('i')
+        # Double precision, so that scores match those of the other builders
+        self._scores = array('d')
+        self._offsets = array('q', [0])
+        self._buffer = array('i')
+        self._path = os.path.join(directory, 'mappings.bin')
+        self._file = open(self._path, 'wb')
+        self._finalized = False
+        self._discarded = False
+        self._n_pairs = 0
+
+    def __len__(self):
+        return self._n_pairs if self._finalized else len(self._offsets) - 1
+
+    def add(self, i, j, score, mapping):
+        """Record the best mapping ``{atom of i: atom of j}`` of pair ``(i, j)``."""
+        self._row.append(i)
+        self._col.append(j)
+        self._scores.append(score)
+        for a, b in mapping.items():
+            self._buffer.append(a)
+            self._buffer.append(b)
+        self._offsets.append(self._offsets[-1] + len(mapping))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered atom mappings to the spill file."""
+        if self._file is not None and self._buffer:
+            self._buffer.tofile(self._file)
+            self._buffer = array('i')
+
+    def close(self):
+        """Close the spill file without finalizing, e.g. when scoring fails."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finalize(self):
+        """
+        Close the spill file and write the pair arrays next to it, so that a
+        kept plan holds neither per-pair memory nor open files.
+        """
+        self.flush()
+        self.close()
+        self._n_pairs = len(self._offsets) - 1
+        for name in ('row', 'col', 'scores', 'offsets'):
+            with open(os.path.join(self.directory, f'{name}.bin'), 'wb') as f:
+                getattr(self, f'_{name}').tofile(f)
+            setattr(self, f'_{name}', None)
+        self._finalized = True
+
+    def _read(self, name, dtype, start=0, count=-1):
+        """``count`` values of a pair array from index ``start``, in memory or on disk."""
+        if not self._finalized:
+            # Copy, so that no buffer export keeps the array from growing
+            values = np.array(getattr(self, f'_{name}'), dtype=dtype)
+            return values[start:] if count < 0 else values[start:start + count]
+        return np.fromfile(os.path.join(self.directory, f'{name}.bin'), dtype=dtype,
+                           count=count, offset=start * np.dtype(dtype).itemsize)
+
+    @property
+    def row(self):
+        return self._read('row', np.int32)
+
+    @property
+    def col(self):
+        return self._read('col', np.int32)
+
+    @property
+    def scores(self):
+        return self._read('scores', np.float64)
+
+    @property
+    def n_mapped(self):
+        return np.diff(self._read('offsets', np.int64)).astype(np.int32)
+
+    def pair(self, k):
+        """Ligand indices and score of pair ``k``."""
+        return (int(self._read('row', np.int32, k, 1)[0]), int(self._read('col', np.int32, k, 1)[0]),
+                float(self._read('scores', np.float64, k, 1)[0]))
+
+    def mapping(self, k):
+        """The atom mapping of pair ``k`` as a dict, read from the spill file."""
+        if not self._finalized:
+            raise RuntimeError("Mappings can only be read after finalize()")
+        if self._discarded:
+            raise RuntimeError("The mappings have been discarded")
+        start, end = self._read('offsets', np.int64, k, 2).tolist()
+        # Each mapped atom is an (a, b) pair of int32
+        atoms = np.fromfile(self._path, dtype=np.int32, count=2 * (end - start),
+                            offset=8 * start).tolist()
+        return dict(zip(atoms[::2], atoms[1::2]))
+
+    def discard_mappings(self):
+        """
+        Delete the spill file once the mappings of the selected edges have
+        been read back; the scores and mapped atom counts are kept.
+        """
+        if os.path.exists(self._path):
+            os.remove(self._path)
+        self._discarded = True
+
+    def ligand_atom_mapping(self, k, ligands):
+        """
+        The LigandAtomMapping of pair ``k``, annotated with its score, with the
+        components taken from ``ligands`` (indexable by ligand index).
+        """
+        i, j, score = self.pair(k)
+        return openfe.LigandAtomMapping(
+            componentA=ligands[i],
+            componentB=ligands[j],
+            componentA_to_componentB=self.mapping(k),
+        ).with_annotations({'score': score})
+
+
+def score_pairs_spilled(store, mappers, scorer, directory, pairs=None, guard=None):
+    """
+    Low-memory counterpart of ``utils.sparse_network.score_pairs``: keep only
+    the best mapping of each pair, spilled to disk, and drop the mapping
+    objects as soon as they are scored.
+
+    Parameters
+    ----------
+    store : LigandStore
+      The ligands to map.
+    mappers : AtomMapper or list[AtomMapper]
+      Mappers used to suggest mappings for each pair.
+    scorer : callable
+      Scores a mapping, higher is better.
+    directory : str
+      Directory of the spill files.
+    pairs : iterable[tuple[int, int]], optional
+      Ligand index pairs to consider, defaults to all pairs.
+    guard : MemoryGuard, optional
+      Checked after every pair; its ligand cache release is registered here.
+
+    Returns
+    -------
+    SpilledPairs
+      The finalized pairs.
+    """
+    if not isinstance(mappers, (list, tuple)):
+        mappers = [mappers]
+    if pairs is None:
+        # Row-major order keeps the first ligand of consecutive pairs cached
+        pairs = itertools.combinations(range(len(store)), 2)
+    spilled = SpilledPairs(store.names, directory)
+    if guard is not None:
+        guard.release.extend([store.clear_cache, spilled.flush])
+
+    try:
+        for i, j in pairs:
+            best_score, best_mapping = None, None
+            ligand_a, ligand_b = store.get(i), store.get(j)
+            for mapper in mappers:
+                for mapping in mapper.suggest_mappings(ligand_a, ligand_b):
+                    score = scorer(mapping)
+                    spilled.n_scored += 1
+                    if best_score is None or score > best_score:
+                        best_score, best_mapping = score, mapping.componentA_to_componentB
+            # Pairs without any mapping simply have no edge
+            if best_mapping is not None:
+                spilled.add(i, j, best_score, best_mapping)
+            if guard is not None:
+                guard.check()
+    except BaseException:
+        spilled.close()
+        raise
+
+    spilled.finalize()
+    return spilled
+
+
+def plan_low_memory_network(store, mappers, scorer, directory, network_type='minimal_spanning',
+                            center_ligand=None, mst_num=2, guard=None):
+    """
+    Score the ligand pairs of a network type with spilled mappings and select
+    the network edges, without materializing any mapping.
+
+    Minimal spanning and redundant networks score all pairs and select edges
+    as the sparse builder does; radial networks only score the pairs of the
+    central ligand, which is componentA of every edge.
+
+    Returns
+    -------
+    tuple[SpilledPairs, np.ndarray]
+      The scored pairs and the indices of the selected edges.
+    """
+    pairs = None
+    if network_type == 'radial':
+        if center_ligand not in store:
+            raise ValueError(f"Center ligand '{center_ligand}' not found in the SDF file")
+        center = store.index[center_ligand]
+        pairs = ((center, j) for j in range(len(store)) if j != center)
+    elif network_type not in ('minimal_spanning', 'minimal_redundant'):
+        raise ValueError(f"Unsupported network type: {network_type}")
+
+    spilled = score_pairs_spilled(store, mappers, scorer, directory, pairs, guard)
+
+    if network_type == 'minimal_spanning':
+        selected = minimal_spanning_edges(spilled, guard=guard)
+    elif network_type == 'minimal_redundant':
+        selected = minimal_redundant_edges(spilled, mst_num=mst_num, guard=guard)
+    else:
+        selected = np.arange(len(spilled), dtype=np.int64)
+
+    # Each access reads the pair arrays from disk
+    row, col = spilled.row, spilled.col
+    if count_components(spilled.n_ligands, row[selected], col[selected]) > 1:
+        raise RuntimeError("Unable to create edges to some nodes: the scored pairs do not connect all ligands")
+    return spilled, selected
@@ -0,0 +1,69 @@
+import collections
+import threading
+
+
+class LRUCache:
+    """
+    Thread-safe dict-like cache holding at most ``max_size`` entries, evicting
+    the least recently used one when full.
+
+    Reading an entry with ``get`` or ``[]`` marks it as recently used.
+    ``on_evict(key, value)`` is called for every evicted or removed entry,
+    outside of the lock, so that it can release what the entry holds.
+
+    Parameters
+    ----------
+    max_size : int
+      Maximum number of entries.
+    on_evict : callable, optional
+      Called with the key and value of each entry that leaves the cache.
+    """
+    def __init__(self, max_size, on_evict=None):
+        if max_size < 1:
+            raise ValueError("The cache must hold at least one entry")
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __setitem__(self, key, value):
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, value)
+            if previous is not value:
+                evicted.append((key, previous))
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False))
+        self._release(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries.pop(key)
+        self._release([(key, value)])
+        return value
+
+    def _release(self, entries):
+        if self.on_evict is not None:
+            for key, value in entries:
+                self.on_evict(key, value)
@@ -5,6 +5,7 @@ import logging
 import warnings
 import os
 import json
+from contextlib import nullcontext
 from functools import partial
 from openff.units import unit
 import openfe
@@ -24,6 +25,16 @@ from openff.toolkit.utils.toolkit_registry import (
 )
 import gufe
 from gufe import tokenization
+try:
+    from utils.score_matrix import ScoreMatrixRecorder
+    from utils.metrics import stage_timer
+    from utils.structured_logging import configure_logging
+    from utils.profiling import PROFILE_MODES, RunProfiler
+except ImportError:  # run as a script from within utils/
+    from score_matrix import ScoreMatrixRecorder
+    from metrics import stage_timer
+    from structured_logging import configure_logging
+    from profiling import PROFILE_MODES, RunProfiler
 
 
 logger = logging.getLogger(__name__)
@@ -62,7 +73,7 @@ def gen_charges(smc):
     Generate AM1BCC partial charges for a SmallMoleculeComponent using
     the input conformer and antechamber as backend.
     """
-    print(f"INFO: generating partial charges for ligand {smc.name} -- this may be slow")
+    logger.info("Generating partial charges for ligand %s -- this may be slow", smc.name)
     offmol = smc.to_openff()
     with toolkit_registry_manager(amber_rdkit):
         offmol.assign_partial_charges(
@@ -72,7 +83,14 @@ def gen_charges(smc):
     return openfe.SmallMoleculeComponent.from_openff(offmol)
 
 
-def gen_ligand_network(smcs, topology_by_names=None):
+def get_scorer():
+    """
+    Utility method for getting the Lomap scorer used to plan the network.
+    """
+    return partial(openfe.lomap_scorers.default_lomap_score, charge_changes_score=0.1)
+
+
+def gen_ligand_network(smcs, topology_by_names=None, scorer=None):
     """
     Creates the ligand network using either Lomap or predefined topology.
 
@@ -83,6 +101,8 @@ def gen_ligand_network(smcs, topology_by_names=None):
     topology_by_names : list[tuple[str, str]], optional
       List of tuples containing molecule name pairs for each edge.
       If provided, uses this topology instead of generating with Lomap.
+    scorer : callable, optional
+      Scorer for the Lomap network, defaults to ``get_scorer()``.
 
     Returns
     -------
@@ -100,15 +120,16 @@ def gen_ligand_network(smcs, topology_by_names=None):
     )
     
     if topology_by_names is not None:
-        print("INFO: Generating network from predefined topology")
+        logger.info("Generating network from predefined topology")
         ligand_network = openfe.ligand_network_planning.generate_network_from_names(
             ligands=smcs,
             mapper=mapper,
             names=topology_by_names,
         )
     else:
-        print("INFO: Generating Lomap Network")
-        scorer = partial(openfe.lomap_scorers.default_lomap_score, charge_changes_score=0.1)
+        logger.info("Generating Lomap Network")
+        if scorer is None:
+            scorer = get_scorer()
         ligand_network = openfe.ligand_network_planning.generate_lomap_network(
             molecules=smcs, mappers=mapper, scorer=scorer)
     
@@ -182,88 +203,27 @@ def get_settings_charge_changes():
     return settings
 
 
-@click.command
-@click.option(
-    '--ligands',
-    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
-    required=True,
-    help="Path to the prepared SDF file containing the ligands",
-)
-@click.option(
-    '--pdb',
-    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
-    required=True,
-    help="Path to the prepared PDB file of the protein",
-)
-@click.option(
-    '--cofactors',
-    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
-    default=None,
-    help="Path to the prepared cofactors SDF file (optional)",
-)
-@click.option(
-    '--output',
-    type=click.Path(dir_okay=True, file_okay=False, path_type=pathlib.Path),
-    default=pathlib.Path('alchemicalNetwork'),
-    help="Directory name in which to store the transformation json files",
-)
-@click.option(
-    '--network-json',
-    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
-    default=None,
-    help="Path to a JSON file containing the network topology to use instead of generating with Lomap",
-)
-def run_inputs(ligands, pdb, cofactors, output, network_json):
+def gen_alchemical_network(ligand_network, solv, prot, cofactors_smc=None):
     """
-    Generate run json files for RBFE calculations
+    Create the solvent and complex leg Transformations of every edge of a
+    ligand network.
 
     Parameters
     ----------
-    ligands : pathlib.Path
-      A Path to a ligands SDF.
-    pdb : pathlib.Path
-      A Path to a protein PDB file.
-    cofactors : Optional[pathlib.Path]
-      A Path to an SDF file containing the system's cofactors.
-    output: pathlib.Path
-      A Path to a directory where the transformation json files
-      and ligand network graphml file will be stored into.
-    network_json: Optional[pathlib.Path]
-      A Path to a JSON file containing the network topology to use.
-    """
-    # Create the output directory -- default to alchemicalNetwork, fail if it exists
-    output.mkdir(exist_ok=False, parents=True)
-    
-    # Create the small molecule components of the ligands
-    rdmols = [mol for mol in Chem.SDMolSupplier(str(ligands), removeHs=False)]
-    smcs = [openfe.SmallMoleculeComponent.from_rdkit(mol) for mol in rdmols]
-    # Generate the partial charges
-    logger.info("Generating partial charges for ligands")
-    smcs = [gen_charges(smc) for smc in smcs]
-
-    # Load network topology from JSON if provided
-    topology_by_names = None
-    if network_json is not None:
-        topology_by_names = load_network_from_json(network_json)
-        logger.info(f"Loaded network topology with {len(topology_by_names)} edges from {network_json}")
+    ligand_network : openfe.LigandNetwork
+      The ligand network, with partially charged ligands.
+    solv : openfe.SolventComponent
+      The solvent of both legs.
+    prot : openfe.ProteinComponent
+      The protein of the complex leg.
+    cofactors_smc : Optional[list[SmallMoleculeComponent]]
+      Partially charged cofactors added to the complex leg.
 
-    # Create ligand network
-    ligand_network = gen_ligand_network(smcs, topology_by_names)
-
-    # Store the ligand network as a graphml file
-    with open(output / "ligand_network.graphml", mode='w') as f:
-        f.write(ligand_network.to_graphml())
-
-    # Create the solvent and protein components
-    solv = openfe.SolventComponent()
-    prot = openfe.ProteinComponent.from_pdb_file(str(pdb))
-
-    # If we have cofactors, load them in and assign partial charges
-    if cofactors is not None:
-        cofactors_smc = [gen_charges(openfe.SmallMoleculeComponent(m))
-                         for m in Chem.SDMolSupplier(str(cofactors), removeHs=False)]
-
-    # Create the AlchemicalTransformations, and storing them to an AlchemicalNetwork
+    Returns
+    -------
+    openfe.AlchemicalNetwork
+      The network of all Transformations.
+    """
     transformations = []
     for mapping in ligand_network.edges:
         # Get different settings depending on whether the transformation
@@ -282,7 +242,7 @@ def run_inputs(ligands, pdb, cofactors, output, network_json):
         else:
             rfe_settings = get_settings()
         for leg in ['solvent', 'complex']:
-            # use the solvent and protein created above
+            # use the solvent and protein passed in
             sysA_dict = {'ligand': mapping.componentA,
                          'solvent': solv}
             sysB_dict = {'ligand': mapping.componentB,
@@ -291,7 +251,7 @@ def run_inputs(ligands, pdb, cofactors, output, network_json):
             if leg == 'complex':
                 sysA_dict['protein'] = prot
                 sysB_dict['protein'] = prot
-                if cofactors is not None:
+                if cofactors_smc is not None:
 
                     for cofactor, entry in zip(cofactors_smc,
                                                string.ascii_lowercase):
@@ -315,8 +275,117 @@ def run_inputs(ligands, pdb, cofactors, output, network_json):
             )
             transformations.append(transformation)
 
-    # Create the alchemical network and write it to disk
-    alchemical_network = openfe.AlchemicalNetwork(transformations)
+    return openfe.AlchemicalNetwork(transformations)
+
+
+def load_cofactors(cofactors):
+    """
+    Load the cofactors of an SDF file and assign their partial charges.
+
+    Parameters
+    ----------
+    cofactors : pathlib.Path
+      A Path to an SDF file containing the system's cofactors.
+
+    Returns
+    -------
+    list[SmallMoleculeComponent]
+      The partially charged cofactors.
+    """
+    return [gen_charges(openfe.SmallMoleculeComponent(m))
+            for m in Chem.SDMolSupplier(str(cofactors), removeHs=False)]
+
+
+def gen_alchemical_network_from_mappings(mappings, ligands, pdb, cofactors=None):
+    """
+    Create the transformations of an already planned ligand network, reusing
+    its atom mappings instead of mapping the ligands again.
+
+    Parameters
+    ----------
+    mappings : list[tuple[str, str, dict[int, int], float]]
+      Names of ligands A and B, atom mapping from A to B and score of each edge.
+    ligands : Mapping[str, SmallMoleculeComponent]
+      The uncharged ligands by name.
+    pdb : pathlib.Path
+      A Path to a protein PDB file.
+    cofactors : Optional[pathlib.Path]
+      A Path to an SDF file containing the system's cofactors.
+
+    Returns
+    -------
+    tuple[openfe.LigandNetwork, openfe.AlchemicalNetwork]
+      The network on the charged ligands and its transformations.
+    """
+    names = sorted({name for a, b, _, _ in mappings for name in (a, b)})
+    logger.info("Generating partial charges for ligands")
+    with stage_timer('rbfe_charges', logger):
+        charged = {name: gen_charges(ligands[name]) for name in names}
+
+    ligand_network = openfe.LigandNetwork([
+        openfe.LigandAtomMapping(
+            componentA=charged[a],
+            componentB=charged[b],
+            componentA_to_componentB=mapping,
+        ).with_annotations({'score': score})
+        for a, b, mapping, score in mappings
+    ])
+
+    with stage_timer('rbfe_protein', logger):
+        prot = openfe.ProteinComponent.from_pdb_file(str(pdb))
+
+    cofactors_smc = None
+    if cofactors is not None:
+        with stage_timer('rbfe_cofactor_charges', logger):
+            cofactors_smc = load_cofactors(cofactors)
+
+    with stage_timer('rbfe_transformations', logger):
+        alchemical_network = gen_alchemical_network(
+            ligand_network, openfe.SolventComponent(), prot, cofactors_smc
+        )
+    return ligand_network, alchemical_network
+
+
+def iter_alchemical_network_files(alchemical_network, ligand_network=None):
+    """
+    Serialize the files written by run_inputs one at a time, e.g. to stream
+    them into an archive without staging them on disk.
+
+    Parameters
+    ----------
+    alchemical_network : openfe.AlchemicalNetwork
+      The network to serialize.
+    ligand_network : Optional[openfe.LigandNetwork]
+      The ligand network, serialized as ligand_network.graphml.
+
+    Yields
+    ------
+    tuple[str, bytes]
+      Path relative to the output directory and content of each file.
+    """
+    if ligand_network is not None:
+        yield "ligand_network.graphml", ligand_network.to_graphml().encode('utf-8')
+    yield "alchemical_network.json", json.dumps(
+        alchemical_network.to_dict(), cls=tokenization.JSON_HANDLER.encoder
+    ).encode('utf-8')
+    for transform in alchemical_network.edges:
+        yield f"transformations/{transform.name}.json", json.dumps(
+            transform.to_dict(), cls=tokenization.JSON_HANDLER.encoder
+        ).encode('utf-8')
+
+
+def write_alchemical_network(alchemical_network, output):
+    """
+    Write an AlchemicalNetwork and each of its Transformations as json files.
+
+    Parameters
+    ----------
+    alchemical_network : openfe.AlchemicalNetwork
+      The network to write.
+    output : pathlib.Path
+      Directory in which alchemical_network.json and the transformations/
+      subdirectory are created.
+    """
     alchemical_network_json_fp = output / "alchemical_network.json"
     json.dump(
         alchemical_network.to_dict(),
@@ -333,5 +402,191 @@ def run_inputs(ligands, pdb, cofactors, output, network_json):
         transform.dump(transforms_dir / f"{transform.name}.json")
 
 
+def generate_rbfe_inputs(ligands, pdb, cofactors, output, network_json=None,
+                         score_matrix=None, score_matrix_prune=None):
+    """
+    Generate run json files for RBFE calculations
+
+    Parameters
+    ----------
+    ligands : pathlib.Path
+      A Path to a ligands SDF.
+    pdb : pathlib.Path
+      A Path to a protein PDB file.
+    cofactors : Optional[pathlib.Path]
+      A Path to an SDF file containing the system's cofactors.
+    output: pathlib.Path
+      A Path to a directory where the transformation json files
+      and ligand network graphml file will be stored into.
+    network_json: Optional[pathlib.Path]
+      A Path to a JSON file containing the network topology to use.
+    score_matrix: Optional[pathlib.Path]
+      A Path to a .npz file where the all-pairs score matrices are stored.
+      Only available when the network is generated with Lomap.
+    score_matrix_prune: Optional[float]
+      Minimum score for a pair to be kept in the (then sparse) score matrix.
+    """
+    # Create the output directory -- default to alchemicalNetwork, fail if it exists
+    output.mkdir(exist_ok=False, parents=True)
+    
+    # Create the small molecule components of the ligands
+    with stage_timer('rbfe_parse', logger):
+        rdmols = [mol for mol in Chem.SDMolSupplier(str(ligands), removeHs=False)]
+        smcs = [openfe.SmallMoleculeComponent.from_rdkit(mol) for mol in rdmols]
+    # Generate the partial charges
+    logger.info("Generating partial charges for ligands")
+    with stage_timer('rbfe_charges', logger):
+        smcs = [gen_charges(smc) for smc in smcs]
+
+    # Load network topology from JSON if provided
+    topology_by_names = None
+    if network_json is not None:
+        topology_by_names = load_network_from_json(network_json)
+        logger.info("Loaded network topology with %d edges from %s", len(topology_by_names), network_json)
+
+    # Record the all-pairs scores if requested
+    scorer = None
+    if score_matrix is not None:
+        if topology_by_names is not None:
+            warnings.warn("A score matrix is only computed for Lomap networks, "
+                          "--score-matrix is ignored with --network-json")
+        else:
+            scorer = ScoreMatrixRecorder([smc.name for smc in smcs], get_scorer())
+
+    # Create ligand network
+    with stage_timer('rbfe_network', logger):
+        ligand_network = gen_ligand_network(smcs, topology_by_names, scorer)
+
+    if scorer is not None:
+        scorer.save(score_matrix, prune=score_matrix_prune)
+
+    # Store the ligand network as a graphml file
+    with open(output / "ligand_network.graphml", mode='w') as f:
+        f.write(ligand_network.to_graphml())
+
+    # Create the solvent and protein components
+    solv = openfe.SolventComponent()
+    with stage_timer('rbfe_protein', logger):
+        prot = openfe.ProteinComponent.from_pdb_file(str(pdb))
+
+    # If we have cofactors, load them in and assign partial charges
+    cofactors_smc = None
+    if cofactors is not None:
+        with stage_timer('rbfe_cofactor_charges', logger):
+            cofactors_smc = load_cofactors(cofactors)
+
+    # Create the AlchemicalTransformations, and storing them to an AlchemicalNetwork
+    with stage_timer('rbfe_transformations', logger):
+        alchemical_network = gen_alchemical_network(ligand_network, solv, prot, cofactors_smc)
+
+    # Write the alchemical network and each transformation to disk
+    with stage_timer('rbfe_write', logger):
+        write_alchemical_network(alchemical_network, output)
+
+
+@click.command
+@click.option(
+    '--ligands',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    required=True,
+    help="Path to the prepared SDF file containing the ligands",
+)
+@click.option(
+    '--pdb',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    required=True,
+    help="Path to the prepared PDB file of the protein",
+)
+@click.option(
+    '--cofactors',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    default=None,
+    help="Path to the prepared cofactors SDF file (optional)",
+)
+@click.option(
+    '--output',
+    type=click.Path(dir_okay=True, file_okay=False, path_type=pathlib.Path),
+    default=pathlib.Path('alchemicalNetwork'),
+    help="Directory name in which to store the transformation json files",
+)
+@click.option(
+    '--network-json',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    default=None,
+    help="Path to a JSON file containing the network topology to use instead of generating with Lomap",
+)
+@click.option(
+    '--score-matrix',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    default=None,
+    help="Path to a .npz file in which to store the all-pairs Lomap score and mapped atom count matrices",
+)
+@click.option(
+    '--score-matrix-prune',
+    type=float,
+    default=None,
+    help="Only store pairs scoring at least this value in the score matrix, as a sparse matrix",
+)
+@click.option(
+    '--log-level',
+    type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR'], case_sensitive=False),
+    default=None,
+    help="Log level, defaults to the FEPLANNER_LOG_LEVEL environment variable or INFO",
+)
+@click.option(
+    '--profile',
+    type=click.Path(dir_okay=False, file_okay=True, path_type=pathlib.Path),
+    default=None,
+    help="Profile the run and write the profile to this file",
+)
+@click.option(
+    '--profile-mode',
+    type=click.Choice(PROFILE_MODES),
+    default='cprofile',
+    help="'cprofile' writes a pstats file, 'sampling' collapsed stacks for flame graphs",
+)
+def run_inputs(ligands, pdb, cofactors, output, network_json, score_matrix,
+               score_matrix_prune, log_level, profile, profile_mode):
+    """
+    Generate run json files for RBFE calculations
+
+    Parameters
+    ----------
+    ligands : pathlib.Path
+      A Path to a ligands SDF.
+    pdb : pathlib.Path
+      A Path to a protein PDB file.
+    cofactors : Optional[pathlib.Path]
+      A Path to an SDF file containing the system's cofactors.
+    output: pathlib.Path
+      A Path to a directory where the transformation json files
+      and ligand network graphml file will be stored into.
+    network_json: Optional[pathlib.Path]
+      A Path to a JSON file containing the network topology to use.
+    score_matrix: Optional[pathlib.Path]
+      A Path to a .npz file where the all-pairs score matrices are stored.
+      Only available when the network is generated with Lomap.
+    score_matrix_prune: Optional[float]
+      Minimum score for a pair to be kept in the (then sparse) score matrix.
+    log_level: Optional[str]
+      Log level; the duration of each stage is logged at INFO.
+    profile: Optional[pathlib.Path]
+      A Path to a file where the profile of the run is stored.
+    profile_mode: str
+      'cprofile' (deterministic, pstats file) or 'sampling' (collapsed stacks).
+    """
+    configure_logging(log_level)
+
+    # Only profile when asked to, so that regular runs pay nothing
+    profiler = RunProfiler(profile_mode) if profile is not None else None
+    with profiler or nullcontext():
+        generate_rbfe_inputs(ligands, pdb, cofactors, output, network_json,
+                             score_matrix, score_matrix_prune)
+
+    if profiler is not None:
+        profiler.dump(profile)
+        logger.info("Wrote %s profile to %s", profile_mode, profile)
+
+
 if __name__ == "__main__":
     run_inputs()
\ No newline at end of file
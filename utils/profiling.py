@@ -0,0 +1,126 @@
+import cProfile
+import collections
+import sys
+import threading
+
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# cProfile allows a single active profiler per process from Python 3.12 on,
+# so profiled runs never overlap
+_active = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a run is profiled while another one is being profiled."""
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stack of one thread at a fixed interval.
+
+    The samples are written in the collapsed stack format (one
+    ``frame;frame;frame count`` line per distinct stack) understood by
+    flamegraph.pl, speedscope and inferno.
+
+    Parameters
+    ----------
+    interval : float
+      Seconds between two samples.
+    thread_id : int, optional
+      Thread to sample, defaults to the thread that calls ``start``.
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """The samples in the collapsed stack format."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+class RunProfiler:
+    """
+    Context manager profiling the enclosed block with cProfile (deterministic,
+    written as a pstats file for snakeviz, gprof2dot or flameprof) or with
+    the SamplingProfiler (written as collapsed stacks for flame graphs).
+
+    Only one run is profiled at a time in a process; entering while another
+    run is profiled raises ProfilerBusy.
+
+    Parameters
+    ----------
+    mode : str
+      'cprofile' or 'sampling'.
+    interval : float
+      Sampling interval in seconds, for the sampling mode.
+    """
+    def __init__(self, mode='cprofile', interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profile mode: {mode}")
+        self.mode = mode
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = SamplingProfiler(interval)
+
+    @property
+    def extension(self):
+        """File extension of the profile written by ``dump``."""
+        return '.prof' if self.mode == 'cprofile' else '.collapsed'
+
+    def __enter__(self):
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("Another run is being profiled")
+        try:
+            if self.mode == 'cprofile':
+                self._profiler.enable()
+            else:
+                self._profiler.start()
+        except BaseException:
+            _active.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.mode == 'cprofile':
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+        finally:
+            _active.release()
+        return False
+
+    def dump(self, path):
+        """Write the profile to ``path``."""
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(str(path))
+        else:
+            with open(path, 'w') as f:
+                f.write(self._profiler.collapsed())
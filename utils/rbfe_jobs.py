@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.metrics import RBFE_JOBS, RBFE_JOBS_FINISHED
+except ImportError:  # run as a script from within utils/
+    from metrics import RBFE_JOBS, RBFE_JOBS_FINISHED
+
+
+logger = logging.getLogger(__name__)
+
+
+class RBFEJob:
+    """
+    State of one background RBFE input generation job.
+
+    Attributes
+    ----------
+    job_id : str
+      Unique ID of the job.
+    sdf_id : str
+      ID of the plan the inputs are generated for.
+    state : str
+      'queued', 'running', 'done' or 'failed'.
+    result : object
+      Return value of the job function once done.
+    error : str
+      Error message once failed.
+    """
+    def __init__(self, sdf_id):
+        self.job_id = str(uuid.uuid4())
+        self.sdf_id = sdf_id
+        self.state = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'sdf_id': self.sdf_id,
+            'state': self.state,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class RBFEJobQueue:
+    """
+    Run jobs on a pool of background worker threads, keeping every job by ID.
+
+    The number of queued and running jobs is exported as the
+    ``feplanner_rbfe_jobs`` gauge.
+
+    Parameters
+    ----------
+    max_workers : int
+      Number of jobs run at once.
+    """
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='rbfe-job')
+        self._lock = threading.Lock()
+        self.jobs = {}
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def submit(self, job, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` as ``job``; its return value becomes ``job.result``."""
+        with self._lock:
+            self.jobs[job.job_id] = job
+        RBFE_JOBS.inc(state='queued')
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        RBFE_JOBS.dec(state='queued')
+        RBFE_JOBS.inc(state='running')
+        job.state = 'running'
+        job.started = time.time()
+        try:
+            job.result = func(*args, **kwargs)
+            job.state = 'done'
+        except Exception as e:
+            logger.exception("RBFE job %s failed: %s", job.job_id, e)
+            job.error = str(e) or type(e).__name__
+            job.state = 'failed'
+        finally:
+            job.finished = time.time()
+            RBFE_JOBS.dec(state='running')
+            RBFE_JOBS_FINISHED.inc(state=job.state)
+            logger.info("RBFE job %s %s after %.1fs", job.job_id, job.state,
+                        job.finished - job.started,
+                        extra={'job_id': job.job_id, 'sdf_id': job.sdf_id, 'state': job.state})
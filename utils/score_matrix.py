@@ -0,0 +1,218 @@
+import io
+from array import array
+
+import numpy as np
+
+
+class ScoreMatrixRecorder:
+    """
+    Wrap a mapping scorer and record every score it produces as sparse
+    COO triplets.
+
+    The openfe network planners score every candidate mapping and then keep
+    only the edges that end up in the network. Passing an instance of this
+    class as the ``scorer`` keeps the score and the number of mapped atoms of
+    every scored pair, in growable arrays of 16 bytes per scored mapping.
+    Dense all-pairs matrices are only built on request with :meth:`dense`.
+
+    Parameters
+    ----------
+    names : list[str]
+      Ligand names, in the order used for the matrix rows and columns.
+    scorer : callable
+      The scorer to wrap, e.g. ``openfe.lomap_scorers.default_lomap_score``.
+    """
+    def __init__(self, names, scorer):
+        self.names = list(names)
+        self.scorer = scorer
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._row, self._col = array('i'), array('i')
+        self._scores = array('f')
+        self._n_mapped = array('i')
+        # Number of mappings scored, including several per pair
+        self.n_scored = 0
+
+    def __call__(self, mapping):
+        score = self.scorer(mapping)
+        self.n_scored += 1
+        self.record(mapping, score)
+        return score
+
+    def record(self, mapping, score):
+        """
+        Store ``score`` for the pair of components in ``mapping``. A pair
+        scored more than once keeps its best score, see :meth:`pairs`.
+        """
+        i = self.index.get(mapping.componentA.name)
+        j = self.index.get(mapping.componentB.name)
+        if i is None or j is None:
+            return
+        # Store each pair in the upper triangle
+        if i > j:
+            i, j = j, i
+        self._row.append(i)
+        self._col.append(j)
+        self._scores.append(score)
+        self._n_mapped.append(len(mapping.componentA_to_componentB))
+
+    def pairs(self):
+        """
+        The best score and its mapped atom count of each scored pair.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+          ``row`` < ``col`` ligand indices, ``scores`` and ``n_mapped``.
+        """
+        row = np.frombuffer(self._row, dtype=np.int32)
+        col = np.frombuffer(self._col, dtype=np.int32)
+        scores = np.frombuffer(self._scores, dtype=np.float32)
+        n_mapped = np.frombuffer(self._n_mapped, dtype=np.int32)
+        # Group by pair, best score first; the stable sort keeps the first
+        # of equal scores, as the planners do
+        order = np.lexsort((-scores, col, row))
+        row, col = row[order], col[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (row[1:] != row[:-1]) | (col[1:] != col[:-1])
+        return row[first], col[first], scores[order][first], n_mapped[order][first]
+
+    def dense(self):
+        """
+        Dense symmetric N x N score and mapped-atom-count matrices; NaN marks
+        pairs that were never scored (e.g. radial networks).
+        """
+        n = len(self.names)
+        row, col, pair_scores, pair_n_mapped = self.pairs()
+        scores = np.full((n, n), np.nan, dtype=np.float32)
+        n_mapped = np.zeros((n, n), dtype=np.int32)
+        scores[row, col] = scores[col, row] = pair_scores
+        n_mapped[row, col] = n_mapped[col, row] = pair_n_mapped
+        return scores, n_mapped
+
+    def save(self, file, prune=None):
+        """
+        Write the recorded scores with :func:`save_score_matrices` (dense) or,
+        when pruned, with :func:`save_sparse_score_matrices`.
+        """
+        if prune is None:
+            scores, n_mapped = self.dense()
+            save_score_matrices(file, self.names, scores, n_mapped)
+        else:
+            save_sparse_score_matrices(file, self.names, *self.pairs(), prune=prune)
+
+    def to_bytes(self, prune=None):
+        """Same as :meth:`save` but return the archive as bytes."""
+        buffer = io.BytesIO()
+        self.save(buffer, prune=prune)
+        return buffer.getvalue()
+
+
+def save_score_matrices(file, names, scores, n_mapped, prune=None):
+    """
+    Write the score and mapped-atom-count matrices to a compressed ``.npz``.
+
+    Without pruning the full dense matrices are stored under ``scores`` and
+    ``n_mapped``. With pruning only the upper-triangle pairs scoring at least
+    ``prune`` are kept, as COO triplets (``row``, ``col``, ``scores``,
+    ``n_mapped``) together with the matrix ``shape``; these load directly
+    into ``scipy.sparse.coo_matrix((scores, (row, col)), shape=shape)``.
+
+    Parameters
+    ----------
+    file : str, pathlib.Path or file-like
+      Destination of the archive.
+    names : list[str]
+      Ligand names indexing the matrix rows and columns.
+    scores : np.ndarray
+      N x N score matrix, NaN for pairs that were not scored.
+    n_mapped : np.ndarray
+      N x N matrix of mapped atom counts.
+    prune : float, optional
+      Minimum score for a pair to be kept. Switches to the sparse layout.
+    """
+    names = np.array(names, dtype=str)
+    if prune is None:
+        np.savez_compressed(file, format='dense', names=names,
+                            scores=scores, n_mapped=n_mapped)
+        return
+
+    row, col = np.triu_indices(len(names), k=1)
+    save_sparse_score_matrices(file, names, row, col, scores[row, col],
+                               n_mapped[row, col], prune=prune)
+
+
+def save_sparse_score_matrices(file, names, row, col, scores, n_mapped, prune=None):
+    """
+    Write scored pairs given as COO triplets to a compressed ``.npz`` in the
+    pruned layout of :func:`save_score_matrices`, without ever building the
+    dense matrices.
+
+    Parameters
+    ----------
+    file : str, pathlib.Path or file-like
+      Destination of the archive.
+    names : list[str]
+      Ligand names indexing ``row`` and ``col``.
+    row, col : np.ndarray
+      Ligand indices of each pair, each pair stored once.
+    scores, n_mapped : np.ndarray
+      Score and mapped atom count of each pair.
+    prune : float, optional
+      Minimum score for a pair to be kept.
+    """
+    names = np.array(names, dtype=str)
+    scores = np.asarray(scores)
+    keep = np.ones(len(scores), dtype=bool) if prune is None else scores >= prune
+    # NaN compares False, so unscored pairs are dropped as well
+    np.savez_compressed(
+        file,
+        format='coo',
+        names=names,
+        shape=np.array((len(names), len(names)), dtype=np.int64),
+        row=np.asarray(row)[keep].astype(np.int32),
+        col=np.asarray(col)[keep].astype(np.int32),
+        scores=scores[keep],
+        n_mapped=np.asarray(n_mapped)[keep],
+    )
+
+
+def score_matrices_to_bytes(names, scores, n_mapped, prune=None):
+    """
+    Same as :func:`save_score_matrices` but return the archive as bytes.
+    """
+    buffer = io.BytesIO()
+    save_score_matrices(buffer, names, scores, n_mapped, prune=prune)
+    return buffer.getvalue()
+
+
+def sparse_score_matrices_to_bytes(names, row, col, scores, n_mapped, prune=None):
+    """
+    Same as :func:`save_sparse_score_matrices` but return the archive as bytes.
+    """
+    buffer = io.BytesIO()
+    save_sparse_score_matrices(buffer, names, row, col, scores, n_mapped, prune=prune)
+    return buffer.getvalue()
+
+
+def load_score_matrices(file):
+    """
+    Load an archive written by :func:`save_score_matrices`.
+
+    Returns
+    -------
+    tuple[list[str], np.ndarray, np.ndarray]
+      Ligand names, dense score matrix and dense mapped-atom-count matrix.
+      Pairs missing from a pruned archive come back as NaN / 0.
+    """
+    with np.load(file) as data:
+        names = data['names'].tolist()
+        if str(data['format']) == 'dense':
+            return names, data['scores'], data['n_mapped']
+
+        n = int(data['shape'][0])
+        row, col = data['row'], data['col']
+        scores = np.full((n, n), np.nan, dtype=data['scores'].dtype)
+        n_mapped = np.zeros((n, n), dtype=data['n_mapped'].dtype)
+        scores[row, col] = scores[col, row] = data['scores']
+        n_mapped[row, col] = n_mapped[col, row] = data['n_mapped']
+        return names, scores, n_mapped
@@ -0,0 +1,223 @@
+import itertools
+import numpy as np
+import openfe
+
+
+class PairwiseMappings:
+    """
+    Array-backed sparse edge list of the best mapping found for each pair of
+    ligands.
+
+    Attributes
+    ----------
+    row, col : np.ndarray
+      Ligand indices of each edge (``row < col``).
+    scores : np.ndarray
+      Score of the best mapping of each edge.
+    mappings : list[LigandAtomMapping]
+      The best mapping of each edge, aligned with the arrays.
+    """
+    def __init__(self, n_ligands, row, col, scores, mappings):
+        self.n_ligands = n_ligands
+        self.row = np.asarray(row, dtype=np.int64)
+        self.col = np.asarray(col, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.mappings = mappings
+
+    def __len__(self):
+        return len(self.mappings)
+
+
+def score_pairs(ligands, mappers, scorer, pairs=None):
+    """
+    Score the mappings of every pair of ligands, keeping only the best
+    mapping per pair.
+
+    Parameters
+    ----------
+    ligands : list[SmallMoleculeComponent]
+      The ligands to map.
+    mappers : AtomMapper or list[AtomMapper]
+      Mappers used to suggest mappings for each pair.
+    scorer : callable
+      Scores a mapping, higher is better.
+    pairs : iterable[tuple[int, int]], optional
+      Ligand index pairs to consider, defaults to all pairs.
+
+    Returns
+    -------
+    PairwiseMappings
+    """
+    if not isinstance(mappers, (list, tuple)):
+        mappers = [mappers]
+    if pairs is None:
+        pairs = itertools.combinations(range(len(ligands)), 2)
+
+    row, col, scores, mappings = [], [], [], []
+    for i, j in pairs:
+        best_score, best_mapping = None, None
+        for mapper in mappers:
+            for mapping in mapper.suggest_mappings(ligands[i], ligands[j]):
+                score = scorer(mapping)
+                if best_score is None or score > best_score:
+                    best_score, best_mapping = score, mapping
+        # Pairs without any mapping simply have no edge
+        if best_mapping is not None:
+            row.append(i)
+            col.append(j)
+            scores.append(best_score)
+            mappings.append(best_mapping)
+
+    return PairwiseMappings(len(ligands), row, col, scores, mappings)
+
+
+def _find(parent, i):
+    # Path halving keeps the trees flat without recursion
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def maximum_spanning_edges(n_nodes, row, col, order, available=None, chunk_size=1 << 20, guard=None):
+    """
+    Kruskal's algorithm with union-find over a pre-sorted edge list.
+
+    The sorted edges are walked in chunks, so that only one chunk at a time
+    is converted to Python integers, and the walk stops as soon as the tree
+    spans all nodes.
+
+    Parameters
+    ----------
+    n_nodes : int
+      Number of nodes.
+    row, col : np.ndarray
+      End points of each edge.
+    order : np.ndarray
+      Edge indices sorted by decreasing score.
+    available : np.ndarray, optional
+      Boolean mask of edges that may be used, defaults to all edges.
+    chunk_size : int
+      Number of sorted edges converted at a time.
+    guard : MemoryGuard, optional
+      Checked between two chunks.
+
+    Returns
+    -------
+    np.ndarray
+      Indices of the edges in the maximum spanning forest.
+    """
+    # Plain lists are much faster than numpy scalars in the union-find loop
+    parent = list(range(n_nodes))
+    selected = []
+    for start in range(0, len(order), chunk_size):
+        if len(selected) >= n_nodes - 1:
+            break
+        chunk = order[start:start + chunk_size]
+        if available is not None:
+            chunk = chunk[available[chunk]]
+        for k, a, b in zip(chunk.tolist(), row[chunk].tolist(), col[chunk].tolist()):
+            root_a, root_b = _find(parent, a), _find(parent, b)
+            if root_a == root_b:
+                continue
+            parent[root_a] = root_b
+            selected.append(k)
+            if len(selected) == n_nodes - 1:
+                break
+        if guard is not None:
+            guard.check()
+    return np.array(selected, dtype=np.int64)
+
+
+def minimal_spanning_edges(pairs, guard=None):
+    """
+    Indices of the edges of the minimal spanning network, i.e. the spanning
+    tree with the highest total score.
+    """
+    # Stable sort so ties resolve in pair order, independent of platform
+    order = np.argsort(-pairs.scores, kind='stable')
+    return maximum_spanning_edges(pairs.n_ligands, pairs.row, pairs.col, order, guard=guard)
+
+
+def minimal_redundant_edges(pairs, mst_num=2, guard=None):
+    """
+    Indices of the edges of the minimal redundant network: the union of
+    ``mst_num`` successive spanning trees, each built from the edges not used
+    by the previous ones.
+
+    The edges are sorted once and every pass only masks out the edges already
+    taken, instead of rebuilding a graph per spanning tree.
+    """
+    order = np.argsort(-pairs.scores, kind='stable')
+    row, col = pairs.row, pairs.col
+    available = np.ones(len(pairs), dtype=bool)
+    for _ in range(mst_num):
+        if not available.any():
+            break
+        selected = maximum_spanning_edges(
+            pairs.n_ligands, row, col, order, available, guard=guard
+        )
+        available[selected] = False
+    return np.flatnonzero(~available)
+
+
+def count_components(n_nodes, row, col):
+    """
+    Number of connected components of the graph given by an edge list.
+    """
+    parent = list(range(n_nodes))
+    components = n_nodes
+    for a, b in zip(row.tolist(), col.tolist()):
+        root_a, root_b = _find(parent, a), _find(parent, b)
+        if root_a != root_b:
+            parent[root_a] = root_b
+            components -= 1
+    return components
+
+
+def generate_sparse_network(ligands, mappers, scorer, network_type='minimal_spanning', mst_num=2):
+    """
+    Array-backed replacement for openfe's ``generate_minimal_spanning_network``
+    and ``generate_minimal_redundant_network``.
+
+    The pairwise scores are kept in a sparse edge list and the spanning trees
+    are built with Kruskal's algorithm on the sorted scores, instead of
+    building dense networkx graphs over all pairs. Unlike openfe, only the
+    best mapping of each pair is kept, so a redundant network never contains
+    the same pair twice.
+
+    Parameters
+    ----------
+    ligands : list[SmallMoleculeComponent]
+      The ligands to connect.
+    mappers : AtomMapper or list[AtomMapper]
+      Mappers used to suggest mappings for each pair.
+    scorer : callable
+      Scores a mapping, higher is better.
+    network_type : str
+      'minimal_spanning' or 'minimal_redundant'.
+    mst_num : int
+      Number of spanning trees combined in a minimal redundant network.
+
+    Returns
+    -------
+    openfe.LigandNetwork
+      The network, each edge annotated with its 'score'.
+    """
+    pairs = score_pairs(ligands, mappers, scorer)
+
+    if network_type == 'minimal_spanning':
+        selected = minimal_spanning_edges(pairs)
+    elif network_type == 'minimal_redundant':
+        selected = minimal_redundant_edges(pairs, mst_num=mst_num)
+    else:
+        raise ValueError(f"Unsupported network type for the sparse builder: {network_type}")
+
+    if count_components(pairs.n_ligands, pairs.row[selected], pairs.col[selected]) > 1:
+        raise RuntimeError("Unable to create edges to some nodes: the scored pairs do not connect all ligands")
+
+    edges = [
+        pairs.mappings[k].with_annotations({'score': float(pairs.scores[k])})
+        for k in selected.tolist()
+    ]
+    return openfe.LigandNetwork(edges, nodes=ligands)
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format each record as one JSON object, including the fields passed
+    through ``extra`` (e.g. ``extra={'stage': 'parse', 'seconds': 0.1}``).
+    """
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Configure the root logger.
+
+    Parameters
+    ----------
+    level : str, optional
+      Log level name, defaults to the FEPLANNER_LOG_LEVEL environment variable
+      or INFO.
+    fmt : str, optional
+      'json' for one JSON object per line or 'text', defaults to the
+      FEPLANNER_LOG_FORMAT environment variable or 'text'.
+    """
+    level = (level or os.environ.get('FEPLANNER_LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('FEPLANNER_LOG_FORMAT', 'text')
+
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -0,0 +1,65 @@
+import io
+import tarfile
+import time
+import zlib
+
+
+class _CompressingSink(io.RawIOBase):
+    """Write-only file gzip-compressing everything written into a list of chunks."""
+    def __init__(self, compresslevel):
+        # wbits=31 produces the gzip container rather than a raw zlib stream
+        self._compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        chunk = self._compressor.compress(data)
+        if chunk:
+            self._chunks.append(chunk)
+        return len(data)
+
+    def finish(self):
+        self._chunks.append(self._compressor.flush())
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_tar_gz(files, prefix='', compresslevel=6):
+    """
+    Build a tar.gz archive while iterating, without staging it on disk or in
+    memory: only the member being added is held at a time.
+
+    Parameters
+    ----------
+    files : iterable[tuple[str, bytes]]
+      Path and content of each member, consumed lazily.
+    prefix : str
+      Directory prepended to every member path.
+    compresslevel : int
+      gzip compression level.
+
+    Yields
+    ------
+    bytes
+      Successive chunks of the archive.
+    """
+    sink = _CompressingSink(compresslevel)
+    mtime = time.time()
+    # Stream mode writes members sequentially and never seeks
+    with tarfile.open(fileobj=sink, mode='w|') as tar:
+        for path, data in files:
+            info = tarfile.TarInfo(f'{prefix}/{path}' if prefix else path)
+            info.size = len(data)
+            info.mtime = mtime
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    sink.finish()
+    yield sink.drain()